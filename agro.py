@@ -0,0 +1,137 @@
+import math
+import time
+import datetime
+
+# season-to-date growing degree days, chill hours, frost hours and reference evapotranspiration
+# per-row work is done by the daily rollup (chill/frost minutes are rollup metrics, see rollups.py);
+# completed days are folded into a running total in STATE_TABLE once each, so a read is the
+# stored total plus today's row; each station has its own totals
+# days compacted before chill/frost were rollup metrics hold estimates (setup_db.backfill_chill) or NULL, read as 0
+STATE_TABLE = "weather_agro"
+ROW_HOURS = 1 / 60  # a minute row, for a station with too few raw rows left to measure its interval
+SPACING_ROWS = 101  # newest raw rows whose median spacing gives a station's logging interval
+
+# site, set for your station; ET0 needs them for extraterrestrial radiation and air pressure
+LATITUDE = 47.6  # degrees north
+ELEVATION = 50  # metres
+
+GDD_BASE, GDD_CAP = 10.0, 30.0  # °C, modified method: temps clamped into [base, cap]
+KRS = 0.16  # Hargreaves radiation coefficient, 0.16 interior / 0.19 coastal (FAO-56 eq. 50)
+ALBEDO = 0.23
+
+def gdd(d):
+    if d['temp_min'] is None or d['temp_max'] is None: return 0.0
+    hi = min(max(d['temp_max'], GDD_BASE), GDD_CAP)
+    lo = min(max(d['temp_min'], GDD_BASE), GDD_CAP)
+    return (hi + lo) / 2 - GDD_BASE
+
+def chill_hours(d):
+    return (d['chill_sum'] or 0) * d['row_hours']
+
+def frost_hours(d):
+    return (d['frost_sum'] or 0) * d['row_hours']
+
+def svp(t):
+    # saturation vapour pressure, kPa (FAO-56 eq. 11)
+    return 0.6108 * math.exp(17.27 * t / (t + 237.3))
+
+def et0(d):
+    """FAO-56 Penman-Monteith daily reference ET (mm), with Rs estimated from the temperature range
+    (no pyranometer on the station) and u2 from the anemometer."""
+    if not d['n'] or d['temp_min'] is None or d['temp_max'] is None: return 0.0
+    tmin, tmax = d['temp_min'], d['temp_max']
+    t = (tmin + tmax) / 2
+    rh = (d['hum_sum'] or 0) / d['n']
+    u2 = (d['wind_sum'] or 0) / d['n'] / 3.6  # km/h to m/s
+    p = (d['pres_sum'] or 0) / d['n'] / 10 or 101.3 * ((293 - 0.0065 * ELEVATION) / 293) ** 5.26  # hPa to kPa
+    doy = datetime.date.fromordinal(d['bucket'] + 719163).timetuple().tm_yday  # local day number to date
+    # extraterrestrial radiation (eq. 21)
+    phi = math.radians(LATITUDE)
+    dr = 1 + 0.033 * math.cos(2 * math.pi * doy / 365)
+    decl = 0.409 * math.sin(2 * math.pi * doy / 365 - 1.39)
+    ws = math.acos(max(-1.0, min(1.0, -math.tan(phi) * math.tan(decl))))
+    ra = 24 * 60 / math.pi * 0.082 * dr * (ws * math.sin(phi) * math.sin(decl) + math.cos(phi) * math.cos(decl) * math.sin(ws))
+    rs = KRS * math.sqrt(max(tmax - tmin, 0)) * ra
+    rso = (0.75 + 2e-5 * ELEVATION) * ra
+    es = (svp(tmax) + svp(tmin)) / 2
+    ea = es * rh / 100
+    rnl = 4.903e-9 * ((tmax + 273.16) ** 4 + (tmin + 273.16) ** 4) / 2 * (0.34 - 0.14 * math.sqrt(max(ea, 0))) \
+        * (1.35 * min(rs / rso, 1) - 0.35 if rso else 0)
+    rn = (1 - ALBEDO) * rs - rnl
+    delta = 4098 * svp(t) / (t + 237.3) ** 2
+    gamma = 0.000665 * p
+    return max(0.0, (0.408 * delta * rn + gamma * 900 / (t + 273) * u2 * (es - ea)) / (delta + gamma * (1 + 0.34 * u2)))
+
+# name: (season start (month, day), per-day value, unit)
+ACCUMULATORS = {
+    "gdd": ((1, 1), gdd, "°C·day"),
+    "chill_hours": ((10, 1), chill_hours, "h"),  # counted over the dormant season
+    "frost_hours": ((7, 1), frost_hours, "h"),  # one winter per season
+    "et0": ((1, 1), et0, "mm"),
+}
+DAILY_COLS = ("bucket", "n", "temp_min", "temp_max", "hum_sum", "wind_sum", "pres_sum", "chill_sum", "frost_sum")
+
+def row_hours(conn, station="local"):
+    """Hours each raw row stands for: the median ts spacing of the station's newest rows, so an
+    ingested station logging every 5 or 10 minutes counts its chill/frost rows right."""
+    ts = [r[0] for r in conn.execute("SELECT ts FROM weather_data WHERE station_id = ? ORDER BY ts DESC LIMIT ?",
+                                     (station, SPACING_ROWS))]
+    gaps = sorted(a - b for a, b in zip(ts, ts[1:]) if a > b)
+    return gaps[len(gaps) // 2] / 3600 if gaps else ROW_HOURS
+
+def days(conn, after, upto, station="local"):
+    """weather_daily rows for local days after < bucket <= upto, as dicts, with the station's row_hours."""
+    q = f"SELECT {', '.join(DAILY_COLS)} FROM weather_daily WHERE station_id = ? AND bucket > ? AND bucket <= ? ORDER BY bucket"
+    rows = conn.execute(q, (station, after, upto)).fetchall()
+    hours = row_hours(conn, station) if rows else ROW_HOURS
+    return [{**dict(zip(DAILY_COLS, r)), "row_hours": hours} for r in rows]
+
+def local_day(ts):
+    return (int(ts) + time.localtime(ts).tm_gmtoff) // 86400
+
+def season_start(day, month_day):
+    date = datetime.date.fromordinal(day + 719163)
+    start = date.replace(month=month_day[0], day=month_day[1])
+    if start > date: start = start.replace(year=date.year - 1)
+    return start.toordinal() - 719163
+
+def create_table(conn):
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {STATE_TABLE} (station_id TEXT NOT NULL, name TEXT NOT NULL,
+                     season INTEGER NOT NULL, through INTEGER NOT NULL, total REAL NOT NULL, PRIMARY KEY (station_id, name))""")
+
+def advance(conn, today, station="local"):
+    """Fold the days before `today` (a local day number) into the season totals (caller commits).
+    Each day is read once, when the first row of a later day arrives."""
+    for name, (start_md, fn, _) in ACCUMULATORS.items():
+        season = season_start(today, start_md)
+        row = conn.execute(f"SELECT season, through, total FROM {STATE_TABLE} WHERE station_id = ? AND name = ?",
+                           (station, name)).fetchone()
+        _, through, total = row if row and row[0] == season else (season, season - 1, 0.0)
+        if through >= today - 1: continue
+        total += sum(fn(d) for d in days(conn, through, today - 1, station))
+        conn.execute(f"""INSERT INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?) ON CONFLICT(station_id, name) DO UPDATE
+                         SET season = excluded.season, through = excluded.through, total = excluded.total""",
+                     (station, name, season, today - 1, total))
+
+def reset(conn):
+    # the daily rollup was rebuilt, so stored totals may be stale; the next advance refolds the season
+    conn.execute(f"DELETE FROM {STATE_TABLE}")
+
+def totals(conn, now=None, station="local"):
+    """Season-to-date values from the stored totals plus the days after them (normally just today).
+    Read-only, so it works on the dashboard's query_only connections."""
+    today = local_day(now or time.time())
+    state = {r[0]: r[1:] for r in conn.execute(f"SELECT name, season, through, total FROM {STATE_TABLE} WHERE station_id = ?", (station,))}
+    out = {}
+    for name, (start_md, fn, unit) in ACCUMULATORS.items():
+        season = season_start(today, start_md)
+        s_season, through, total = state.get(name, (None, None, None))
+        if s_season != season: through, total = season - 1, 0.0
+        today_value = 0.0
+        for d in days(conn, through, today, station):
+            v = fn(d)
+            total += v
+            if d['bucket'] == today: today_value = v
+        out[name] = {"season_start": datetime.date.fromordinal(season + 719163).isoformat(),
+                     "total": round(total, 2), "today": round(today_value, 2), "unit": unit}
+    return out
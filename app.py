@@ -1,10 +1,29 @@
-from flask import Flask, render_template_string, request, jsonify, send_file, url_for, redirect
+from flask import Flask, Response, g, render_template_string, request, jsonify, send_file, stream_with_context, url_for, redirect
 import sqlite3
 import io
+import csv
+import json
+import tempfile
+import threading
+import queue
+import atexit
+import time
 import datetime
+import gzip
+import zlib
+import re
+import heapq
+import hmac
 from datetime import timedelta
-import pandas as pd
+from collections import Counter, OrderedDict, deque
 import math
+import wind
+import rollups
+import metrics
+import archive
+import agro
+import writer
+import current
 import subprocess
 
 app = Flask(__name__)
@@ -12,17 +31,37 @@ app = Flask(__name__)
 # match structure
 DB_PATH = "/home/weatherstation/weather_data/weather.db"
 
-# wind direction mapping
-VOLT_MAP = {
-    0.4: "W", 0.9: "NW", 1.2: "N", 1.4: "SW",
-    1.8: "NE", 2.0: "S", 2.2: "SE", 2.8: "E"
-}
+EXPORT_COLUMNS = ["id", "timestamp", "ts", "temp_c", "humidity", "pressure_hpa",
+                  "wind_speed_kph", "rain_mm", "wind_dir_voltage", "gust_kph", "rain_rate_mmh", "station_id"]
+EXPORT_BATCH = 500  # rows per fetchmany, keeps /export memory flat
+ARCHIVE_DIR = "/home/weatherstation/weather_data/archive"  # written by archive.py / compact.py
 
-def get_wind_cardinal(volts):
-    if volts is None or volts < 0.1: return "--"
-    closest_v = min(VOLT_MAP.keys(), key=lambda k: abs(k-volts))
-    if abs(closest_v - volts) > 0.3: return "?" 
-    return VOLT_MAP[closest_v]
+DB_POOL_SIZE = 4  # idle read connections kept open between requests
+DB_PRAGMAS = ("PRAGMA mmap_size=67108864", "PRAGMA cache_size=-8000",
+              "PRAGMA temp_store=MEMORY", "PRAGMA query_only=1")
+API_CACHE_SIZE = 32  # distinct query strings kept for /api/v2/data
+CHART_POINTS = 300  # default ?points=, about a phone-width chart
+CHART_POINTS_MAX = 2000
+GZIP_LEVEL = 6
+GZIP_MIN = 512  # bytes; smaller bodies go out as-is
+# OS connectivity checks; any answer but the expected one makes the phone open the portal
+PROBE_PATHS = {"generate_204", "gen_204", "hotspot-detect.html", "library/test/success.html",
+               "connecttest.txt", "ncsi.txt", "redirect", "success.txt", "canonical.html",
+               "kindle-wifi/wifistub.html"}
+ASSET_EXTS = (".ico", ".png", ".jpg", ".gif", ".svg", ".webp", ".css", ".js", ".map", ".woff", ".woff2", ".xml")
+HIT_LOG_INTERVAL = 60  # seconds between captive portal log lines
+STREAM_POLL = 2  # seconds between the stream watcher's checks for new rows
+STREAM_KEEPALIVE = 15  # seconds of silence before a comment line keeps the connection open
+STREAM_BACKLOG = 1440  # readings kept in memory for reconnecting clients, a day
+WEB_METRICS_PATH = "/home/weatherstation/weather_data/web_metrics.json"
+LOGGER_METRICS_PATH = "/home/weatherstation/weather_data/logger_metrics.json"  # written by logger.py
+METRICS_INTERVAL = 60  # seconds between JSON snapshots
+# /api/v2/ingest, remote stations uploading to this one (see uploader.py)
+INGEST_TOKEN = None  # ingest is off until set; uploaders then send "Authorization: Bearer <token>"
+INGEST_MAX_ROWS = 10000  # per batch, a week of minute rows
+INGEST_MAX_BYTES = 8 * 1024 * 1024  # decompressed body
+STATION_RE = re.compile(r"[A-Za-z0-9_-]{1,32}")
+CURRENT_PATH = "/dev/shm/weather_current"  # published by logger.py every cycle
 
 def calculate_dew_point(T, RH):
     if T is None or RH is None or RH == 0: return None
@@ -31,7 +70,7 @@ def calculate_dew_point(T, RH):
     return (c * gamma) / (b - gamma)
 
 # "insights" function, provided by GLM 4.6
-def generate_objective_insights(curr, prev, range_arg):
+def generate_objective_insights(curr, prev, range_arg, season=None):
     insights = []
     
     # 1. Frost / Cold Stress
@@ -65,91 +104,660 @@ def generate_objective_insights(curr, prev, range_arg):
         direction = "rising" if pres_diff > 0 else "falling"
         insights.append(("🧭", f"Barometer pressure {direction} rapidly ({abs(pres_diff):.1f} hPa)."))
 
+    # 6. Season to date, from the running totals in agro.py
+    if season:
+        if season['frost_hours']['today'] > 0:
+            insights.append(("🥶", f"{season['frost_hours']['today']:.1f} frost hours today."))
+        if season['et0']['today'] >= 5:
+            insights.append(("💧", f"High crop water demand (ET0 {season['et0']['today']:.1f}mm today)."))
+        if season['gdd']['total'] > 0:
+            insights.append(("🌱", f"{season['gdd']['total']:.0f} growing degree days since {season['gdd']['season_start']}."))
+
     if not insights:
         insights.append(("✅", "Conditions are stable."))
-        
+
     return insights
 
+class ResponseCache:
+    """LRU of serialized responses, each tagged with the db version it was built from."""
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            hit = self.entries.get(key)
+            if hit is None or hit[0] != version: return None
+            self.entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, key, version, body):
+        with self.lock:
+            self.entries[key] = (version, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size: self.entries.popitem(last=False)
+
+api_cache = ResponseCache(API_CACHE_SIZE)
+gzip_cache = ResponseCache(8)  # static files, compressed once per version
+
+@app.before_request
+def start_timer():
+    g.t0 = time.perf_counter()
+
+ROUTE_METRICS = {}  # (route, status) -> (latency, size, count), looked up once per combination
+
+def route_metrics(route, status):
+    m = ROUTE_METRICS.get((route, status))
+    if m is None:
+        reg = metrics.REGISTRY
+        m = ROUTE_METRICS[route, status] = (
+            reg.histogram("http_request_seconds", "Time to build the response (streams: to the first byte)", route=route),
+            reg.histogram("http_response_bytes", "Response body size", metrics.SIZE_BUCKETS, route=route),
+            reg.counter("http_responses_total", "Responses by route and status", route=route, status=status))
+    return m
+
+@app.after_request
+def record_request(resp):
+    # registered before compress_static, so it runs after it and sees the bytes actually sent
+    latency, size, count = route_metrics(request.url_rule.rule if request.url_rule else "unmatched", resp.status_code)
+    if 't0' in g: latency.observe(time.perf_counter() - g.t0)
+    if resp.content_length is not None: size.observe(resp.content_length)
+    count.inc()
+    return resp
+
+@app.route('/metrics')
+def prometheus():
+    snap = metrics.REGISTRY.snapshot() + metrics.read_snapshot(LOGGER_METRICS_PATH)
+    return Response(metrics.render(snap), mimetype='text/plain; version=0.0.4')
+
+def db_version(conn):
+    # newest row id and its time, a single rowid b-tree lookup; changes whenever the logger writes
+    row = conn.execute("SELECT id, ts FROM weather_data ORDER BY id DESC LIMIT 1").fetchone()
+    return tuple(row) if row else (None, None)
+
+def compress(body):
+    return gzip.compress(body, GZIP_LEVEL) if len(body) >= GZIP_MIN else None
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+def not_modified(etag, last_modified=None):
+    """A 304 if the client's copy is current, else None. Nothing is built or queried for it."""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and last_modified is not None and int(since.timestamp()) >= last_modified
+    if not fresh: return None
+    resp = Response(status=304)
+    resp.set_etag(etag, weak=True)
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def send_body(raw, gz, mimetype, etag, last_modified=None):
+    if gz is not None and accepts_gzip():
+        resp = Response(gz, mimetype=mimetype)
+        resp.headers['Content-Encoding'] = 'gzip'
+    else:
+        resp = Response(raw, mimetype=mimetype)
+    # weak: the gzip and plain bodies share one tag
+    resp.set_etag(etag, weak=True)
+    if last_modified is not None: resp.last_modified = last_modified
+    resp.headers['Cache-Control'] = 'no-cache'  # always revalidate, a 304 is a few bytes
+    resp.vary.add('Accept-Encoding')
+    return resp
+
+def cached_json(build):
+    """Serve build(conn) through api_cache, conditional on the newest row id."""
+    key = (request.path, *sorted(request.args.items()))
+    conn = get_db()
+    version = db_version(conn)
+    etag = f"{version[0]}-{zlib.crc32(repr(key).encode()):08x}"
+    resp = not_modified(etag, version[1])
+    if resp is not None: return resp
+    entry = api_cache.get(key, version)
+    if entry is None:
+        body = jsonify(build(conn)).get_data()
+        entry = (body, compress(body))
+        api_cache.put(key, version, entry)
+    return send_body(*entry, 'application/json', etag, version[1])
+
 # flask routes
 
 @app.route('/api/v2/data')
 def api_v2():
-    range_arg = request.args.get('range', '7d')
-    conn = get_db()
-    
-    now = datetime.datetime.now()
-    if range_arg == '24h':
-        start = now - timedelta(days=1)
-        prev_start = start - timedelta(days=1)
-        grp, fmt = "", "%H:%M"
-    elif range_arg == '7d':
-        start = now - timedelta(days=7)
-        prev_start = start - timedelta(days=7)
-        grp, fmt = "GROUP BY strftime('%Y-%m-%d', timestamp)", "%Y-%m-%d"
-    else: 
-        start = now - timedelta(days=30)
-        prev_start = start - timedelta(days=30)
-        grp, fmt = "GROUP BY strftime('%Y-%m-%d', timestamp)", "%m-%d"
-
-    # chart data
-    query = f"""
-        SELECT strftime('{fmt}', timestamp) as label,
-               SUM(rain_mm) as rain, AVG(temp_c) as temp, AVG(humidity) as hum, 
-               AVG(pressure_hpa) as pres, AVG(wind_speed_kph) as wind, MAX(wind_speed_kph) as gust
-        FROM weather_data WHERE timestamp >= ? {grp} ORDER BY timestamp ASC
-    """
-    if range_arg == '24h': 
-         query = f"""
-            SELECT strftime('{fmt}', timestamp) as label,
-                   rain_mm as rain, temp_c as temp, humidity as hum, 
-                   pressure_hpa as pres, wind_speed_kph as wind, wind_speed_kph as gust
-            FROM weather_data WHERE timestamp >= ? ORDER BY timestamp ASC
-        """
-    rows = conn.execute(query, (start,)).fetchall()
-
-    # current stats
-    stats_q = """
-        SELECT SUM(rain_mm) as total_rain, AVG(temp_c) as avg_temp, MAX(temp_c) as max_temp, MIN(temp_c) as min_temp,
-               MAX(wind_speed_kph) as max_wind, AVG(wind_speed_kph) as avg_wind,
-               AVG(humidity) as avg_hum, AVG(pressure_hpa) as avg_pres,
-        FROM weather_data WHERE timestamp >= ?
-    """
-    curr = dict(conn.execute(stats_q, (start,)).fetchone())
-    for k in curr: curr[k] = curr[k] or 0 
+    points = request.args.get('points', CHART_POINTS, type=int)
+    points = max(10, min(points, CHART_POINTS_MAX))
+    if 'start' not in request.args and 'bucket' not in request.args:
+        return cached_json(lambda conn: build_api_v2(conn, request.args.get('range', '7d'), points, station=station_arg()))
+    # ?start=&end=&bucket=: any window, local ISO times or epoch seconds, end defaults to now
+    try:
+        now = int(time.time())
+        start = parse_window_time(request.args.get('start')) or now - 86400
+        end = parse_window_time(request.args.get('end'), is_end=True) or now
+        bucket = parse_bucket(request.args.get('bucket', '1h'))
+        if end <= start: raise ValueError("end must be after start")
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return cached_json(lambda conn: build_window(conn, start, end, bucket, points, station_arg()))
+
+def station_arg():
+    # ?station= on the read routes, this Pi's own sensors by default
+    return request.args.get('station', rollups.LOCAL_STATION)
+
+def parse_window_time(value, is_end=False):
+    return int(value) if value and value.isdigit() else parse_export_time(value, is_end)
+
+@app.route('/api/v2/agro')
+def agro_totals():
+    # season-to-date running totals, a handful of primary-key reads (see agro.py)
+    return cached_json(lambda conn: {**agro.totals(conn, station=station_arg()), "gdd_base": agro.GDD_BASE, "gdd_cap": agro.GDD_CAP})
+
+@app.route('/api/v2/windrose')
+def windrose():
+    return cached_json(lambda conn: build_windrose(conn, request.args.get('range', '7d'), station=station_arg()))
+
+def rose_counts(rows):
+    """Bin (volts, kph) rows into a sectors x speed bands table in one vectorized pass."""
+    import numpy as np  # only the 24h rose needs it, kept out of startup (see bench/startup.py)
+    nb = len(wind.BANDS)
+    if not rows: return np.zeros((len(wind.POINTS), nb), dtype=int)
+    volts, kph = np.nan_to_num(np.array(rows, dtype=float)).T
+    i = np.searchsorted(wind.MIDPOINTS, volts, side='left')  # same rule as wind.nearest
+    ok = (volts >= 0.1) & (np.abs(np.asarray(wind.VOLTS)[i] - volts) <= wind.TOLERANCE)
+    sector = np.asarray(wind.SECTORS)[i[ok]]
+    band = np.searchsorted(wind.BAND_EDGES, kph[ok], side='right')
+    return np.bincount(sector * nb + band, minlength=len(wind.POINTS) * nb).reshape(-1, nb)
+
+def build_windrose(conn, range_arg, now=None, station=rollups.LOCAL_STATION):
+    days = RANGES.get(range_arg, RANGES['30d'])[0]
+    now = now or time.time()
+    start = int(now - days * 86400)
+    raw_q = "SELECT wind_dir_voltage, wind_speed_kph FROM weather_data WHERE station_id = ? AND ts >= ? AND ts < ?"
+    if days == 1:
+        counts = rose_counts(conn.execute(raw_q, (station, start, 2 ** 62)).fetchall()).tolist()
+    else:
+        # the whole local days after the one `start` falls in from the rose rollup (see rollups.py),
+        # the rest of that first day from raw rows, so the rose covers exactly the range
+        day = (start + time.localtime(start).tm_gmtoff) // 86400
+        midnight = int(datetime.datetime.fromordinal(day + 719163 + 1).timestamp())
+        counts = [[0] * len(wind.BANDS) for _ in wind.POINTS]
+        q = f"SELECT dir, band, SUM(n) FROM {rollups.ROSE_TABLE} WHERE station_id = ? AND bucket > ? GROUP BY dir, band"
+        for d, b, n in conn.execute(q, (station, day)): counts[d][b] = n
+        for row in conn.execute(raw_q, (station, start, midnight)):
+            d = wind.direction_index(row[0])
+            if d is not None: counts[d][wind.speed_band(row[1])] += 1
+    return {
+        "points": wind.POINTS,
+        "bands": wind.BANDS,
+        "counts": counts,  # [sector][band] sample counts
+        "total": sum(map(sum, counts))
+    }
+
+# per range: window days, scan query, seconds per bucket, label format (local time)
+RAW_SCAN = """
+    SELECT ts as bucket, 1 as n, rain_mm as rain_sum, temp_c as temp_sum,
+           temp_c as temp_min, temp_c as temp_max, humidity as hum_sum, pressure_hpa as pres_sum,
+           wind_speed_kph as wind_sum, wind_speed_kph as wind_max, gust_kph as gust_max,
+           rain_rate_mmh as rate_max, wind_dir_voltage
+    FROM weather_data WHERE station_id = ? AND ts >= ? ORDER BY ts ASC
+"""
+HOURLY_SCAN = """
+    SELECT bucket, n, rain_sum, temp_sum, temp_min, temp_max, hum_sum, pres_sum,
+           wind_sum, wind_max, gust_max, rate_max, NULL as wind_dir_voltage
+    FROM weather_hourly WHERE station_id = ? AND bucket >= ? ORDER BY bucket ASC
+"""
+RANGES = {
+    '24h': (1, RAW_SCAN, 1, "%H:%M"),
+    '7d': (7, HOURLY_SCAN, 3600, "%m-%d %H:00"),
+    '30d': (30, HOURLY_SCAN, 3600, "%m-%d %H:00"),
+}
+
+def _lo(a, b): return b if a is None else a if b is None else min(a, b)
+def _hi(a, b): return b if a is None else a if b is None else max(a, b)
+
+class Agg:
+    """Merges rollup-shaped rows (n, *_sum, *_min, *_max); a raw row is a bucket of one."""
+    __slots__ = ('n', 'rain', 'temp', 'hum', 'pres', 'wind', 'temp_min', 'temp_max', 'wind_max',
+                 'gust_max', 'rate_max')
+
+    def __init__(self):
+        self.n = 0
+        self.rain = self.temp = self.hum = self.pres = self.wind = 0.0
+        self.temp_min = self.temp_max = self.wind_max = self.gust_max = self.rate_max = None
+
+    def add(self, r):
+        self.n += r['n']
+        self.rain += r['rain_sum'] or 0
+        self.temp += r['temp_sum'] or 0
+        self.hum += r['hum_sum'] or 0
+        self.pres += r['pres_sum'] or 0
+        self.wind += r['wind_sum'] or 0
+        self.temp_min = _lo(self.temp_min, r['temp_min'])
+        self.temp_max = _hi(self.temp_max, r['temp_max'])
+        self.wind_max = _hi(self.wind_max, r['wind_max'])
+        self.gust_max = _hi(self.gust_max, r['gust_max'])
+        self.rate_max = _hi(self.rate_max, r['rate_max'])
+
+    def merge(self, o):
+        self.n += o.n
+        self.rain += o.rain; self.temp += o.temp; self.hum += o.hum
+        self.pres += o.pres; self.wind += o.wind
+        self.temp_min = _lo(self.temp_min, o.temp_min)
+        self.temp_max = _hi(self.temp_max, o.temp_max)
+        self.wind_max = _hi(self.wind_max, o.wind_max)
+        self.gust_max = _hi(self.gust_max, o.gust_max)
+        self.rate_max = _hi(self.rate_max, o.rate_max)
+
+    def gust(self):
+        # rows logged before gust_kph existed only have the 1-minute average to offer
+        return _hi(self.gust_max, self.wind_max)
+
+    def avg(self, total):
+        return total / self.n if self.n else None
+
+def downsample(chart, points):
+    """Merge neighbouring chart buckets down to `points`; rain keeps its sum, gust its max."""
+    if len(chart) <= points: return chart
+    keys = list(chart)
+    out = OrderedDict()
+    for i in range(points):
+        group = keys[i * len(keys) // points:(i + 1) * len(keys) // points]
+        point = out[group[0]] = Agg()
+        for k in group: point.merge(chart[k])
+    return out
+
+def summarize_window(rows, start):
+    """Single pass over [prev_start, now): chart buckets, current totals, previous totals."""
+    chart, curr, prev = OrderedDict(), Agg(), Agg()
+    last_volts = None
+    for r in rows:
+        if r['bucket'] < start:
+            prev.add(r)
+            continue
+        point = chart.get(r['bucket'])
+        if point is None: point = chart[r['bucket']] = Agg()
+        point.add(r)
+        curr.add(r)
+        last_volts = r['wind_dir_voltage']
+    return chart, curr, prev, last_volts
+
+def window_stats(agg):
+    curr = {
+        "total_rain": agg.rain, "avg_temp": agg.avg(agg.temp),
+        "max_temp": agg.temp_max, "min_temp": agg.temp_min,
+        "max_wind": agg.wind_max, "avg_wind": agg.avg(agg.wind), "max_gust": agg.gust(),
+        "max_rain_rate": agg.rate_max,
+        "avg_hum": agg.avg(agg.hum), "avg_pres": agg.avg(agg.pres)
+    }
+    for k in curr: curr[k] = curr[k] or 0
     curr['dew_point'] = calculate_dew_point(curr['avg_temp'], curr['avg_hum'])
+    return curr
+
+def chart_series(chart, labels):
+    return {
+        "labels": labels,
+        "rain": [p.rain for p in chart.values()],
+        "temp": [p.avg(p.temp) for p in chart.values()],
+        "hum": [p.avg(p.hum) for p in chart.values()],
+        "pres": [p.avg(p.pres) for p in chart.values()],
+        "wind": [p.avg(p.wind) for p in chart.values()],
+        "gust": [p.gust() for p in chart.values()],
+        "n": [p.n for p in chart.values()]  # samples per point, for clients folding in streamed readings
+    }
+
+def build_api_v2(conn, range_arg, points=CHART_POINTS, now=None, station=rollups.LOCAL_STATION):
+    # 7d/30d read the hourly rollup (see rollups.py) instead of the raw minute rows
+    days, scan, secs, label = RANGES.get(range_arg, RANGES['30d'])
+    now = now or time.time()
+    start = int(now - days * 86400) // secs
+    prev_start = start - days * 86400 // secs
+
+    rows = conn.execute(scan, (station, prev_start))
+    chart, agg, prev_agg, last_volts = summarize_window(rows, start)
+    chart = downsample(chart, points)
 
-    # prev stats
-    prev_q = "SELECT AVG(pressure_hpa) as avg_pres FROM weather_data WHERE timestamp >= ? AND timestamp < ?"
-    row = conn.execute(prev_q, (prev_start, start)).fetchone()
-    prev = dict(row) if row else {}
-    if 'avg_pres' not in prev or prev['avg_pres'] is None:
+    curr = window_stats(agg)
+    prev = {'avg_pres': prev_agg.avg(prev_agg.pres)}
+    if prev['avg_pres'] is None:
         prev['avg_pres'] = curr.get('avg_pres', 0)
 
-    # wind check
-    latest_q = "SELECT wind_dir_voltage FROM weather_data ORDER BY id DESC LIMIT 1"
-    last_row = conn.execute(latest_q).fetchone()
-    last_volts = last_row['wind_dir_voltage'] if last_row else 0
-    dir_str = get_wind_cardinal(last_volts)
+    # wind check, the raw scan already saw the newest row; otherwise the logger's shared snapshot has it
+    snap = live.read() if last_volts is None and station == rollups.LOCAL_STATION else None
+    if snap is not None: last_volts = snap['reading']['wind_dir_voltage'] or 0
+    if last_volts is None:
+        latest_q = "SELECT wind_dir_voltage FROM weather_data WHERE station_id = ? ORDER BY ts DESC LIMIT 1"
+        last_row = conn.execute(latest_q, (station,)).fetchone()
+        last_volts = (last_row['wind_dir_voltage'] if last_row else 0) or 0
+    dir_str = wind.cardinal(last_volts)
     
     wind_ok = (last_volts > 0.1) or (curr['max_wind'] > 0)
 
-    conn.close()
-
-    return jsonify({
-        "chart": {
-            "labels": [r['label'] for r in rows],
-            "rain": [r['rain'] for r in rows],
-            "temp": [r['temp'] for r in rows],
-            "hum": [r['hum'] for r in rows],
-            "pres": [r['pres'] for r in rows],
-            "wind": [r['wind'] for r in rows],
-            "gust": [r['gust'] for r in rows]
-        },
+    # when the stream's readings start a new chart point, and how wide that point is (points are
+    # merged buckets, see downsample)
+    keys = list(chart)
+    point_secs = ((keys[-1] - keys[-2]) if len(keys) > 1 else 1) * secs if keys else None
+    next_bucket = keys[-1] * secs + point_secs if keys else None
+
+    return {
+        "chart": chart_series(chart, [time.strftime(label, time.localtime(k * secs)) for k in chart]),
+        "next_bucket": next_bucket,
+        "point_secs": point_secs,
         "stats": curr,
         "latest_dir": dir_str,
         "wind_ok": wind_ok,
-        "insights": generate_objective_insights(curr, prev, range_arg)
-    })
+        "insights": generate_objective_insights(curr, prev, range_arg, agro.totals(conn, now, station)),
+        "last_id": conn.execute("SELECT MAX(id) FROM weather_data").fetchone()[0]  # /api/v2/stream cursor
+    }
+
+# ?start=&end=&bucket= windows: each tier as rollup-shaped rows with `t`, the bucket start in
+# epoch seconds (local seconds for daily), and the step it can answer exactly
+_ROLLUP_COLS = "n, rain_sum, temp_sum, temp_min, temp_max, hum_sum, pres_sum, wind_sum, wind_max, gust_max, rate_max"
+_RAW_COLS = """1 AS n, rain_mm AS rain_sum, temp_c AS temp_sum, temp_c AS temp_min, temp_c AS temp_max,
+               humidity AS hum_sum, pressure_hpa AS pres_sum, wind_speed_kph AS wind_sum,
+               wind_speed_kph AS wind_max, gust_kph AS gust_max, rain_rate_mmh AS rate_max"""
+TIERS = [  # coarsest first
+    ("daily", 86400, f"""SELECT bucket * 86400 AS t, {_ROLLUP_COLS} FROM weather_daily
+                 WHERE station_id = ? AND bucket >= ? / 86400 AND bucket < ? / 86400"""),
+    ("hourly", 3600, f"""SELECT bucket * 3600 AS t, {_ROLLUP_COLS} FROM weather_hourly
+                   WHERE station_id = ? AND bucket >= ? / 3600 AND bucket < ? / 3600"""),
+    # compact.py moves raw rows past retention into weather_10min, so the two never overlap
+    ("10min", 600, f"""SELECT bucket * 600 AS t, {_ROLLUP_COLS} FROM {rollups.TEN_MIN_TABLE}
+                  WHERE station_id = ? AND bucket >= ? / 600 AND bucket < ? / 600
+                  UNION ALL SELECT ts AS t, {_RAW_COLS} FROM weather_data WHERE station_id = ? AND ts >= ? AND ts < ?"""),
+    ("raw", 60, f"SELECT ts AS t, {_RAW_COLS} FROM weather_data WHERE station_id = ? AND ts >= ? AND ts < ?"),
+]
+WINDOW_SCAN = """
+    SELECT (t - ?) / ? AS k, SUM(n) AS n, SUM(rain_sum) AS rain_sum, SUM(temp_sum) AS temp_sum,
+           MIN(temp_min) AS temp_min, MAX(temp_max) AS temp_max, SUM(hum_sum) AS hum_sum,
+           SUM(pres_sum) AS pres_sum, SUM(wind_sum) AS wind_sum, MAX(wind_max) AS wind_max,
+           MAX(gust_max) AS gust_max, MAX(rate_max) AS rate_max
+    FROM ({source}) GROUP BY k ORDER BY k
+"""
+BUCKET_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+BUCKET_LADDER = (60, 300, 600, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400, 28 * 86400)
+
+def parse_bucket(value):
+    # "5m", "1h", "1d", "1w"; sub-day sizes must divide a day, longer ones be whole days
+    if not value or value[-1] not in BUCKET_UNITS or not value[:-1].isdigit() or int(value[:-1]) < 1:
+        raise ValueError(f"bad bucket {value!r}, use e.g. 5m, 1h, 1d, 1w")
+    secs = int(value[:-1]) * BUCKET_UNITS[value[-1]]
+    if (secs < 86400 and 86400 % secs) or (secs > 86400 and secs % 86400):
+        raise ValueError(f"bucket {value!r} does not divide a day into whole buckets")
+    return secs
+
+def plan_window(start, end, bucket, points):
+    """Widen the bucket until the window fits in `points`, snap the window to bucket edges and
+    pick the coarsest tier that answers it exactly. Returns (tier, start, end, bucket, origin)."""
+    # whole local days, computed in local seconds so DST does not shift the day edges
+    day_start = (start + time.localtime(start).tm_gmtoff) // 86400 * 86400
+    day_end = -(-(end + time.localtime(end).tm_gmtoff) // 86400) * 86400
+    # counted on the span snapped to bucket edges, which can hold one bucket more than the window
+    fits = lambda b: (-(-(day_end - day_start) // b) if b >= 86400 else -(-end // b) - start // b) <= points
+    for wider in BUCKET_LADDER:
+        if fits(bucket): break
+        if wider > bucket and (wider < 86400 or wider % 86400 == 0): bucket = wider
+    if bucket >= 86400:
+        # past the top of the ladder, keep widening by whole multiples of it
+        top = BUCKET_LADDER[-1]
+        if not fits(bucket): bucket = -(-(day_end - day_start) // (points * top)) * top
+        return TIERS[0], day_start, day_end, bucket, day_start
+    start, end = start // bucket * bucket, -(-end // bucket) * bucket
+    tier = next(t for t in TIERS[1:] if bucket % t[1] == 0)
+    return tier, start, end, bucket, start
+
+def build_window(conn, start, end, bucket, points=CHART_POINTS, station=rollups.LOCAL_STATION):
+    tier, start, end, bucket, origin = plan_window(start, end, bucket, points)
+    name, step, source = tier
+    args = (station, start, end) * (2 if name == "10min" else 1)
+    chart, agg = OrderedDict(), Agg()
+    for r in conn.execute(WINDOW_SCAN.format(source=source), (origin, bucket, *args)):
+        point = chart[origin + r['k'] * bucket] = Agg()
+        point.add(r)
+        agg.merge(point)
+    # daily keys are local seconds already; the rest are epoch seconds shown in local time
+    to_tm = time.gmtime if name == "daily" else time.localtime
+    label = "%Y-%m-%d" if bucket >= 86400 else "%m-%d %H:%M"
+
+    curr = window_stats(agg)
+    return {
+        "chart": chart_series(chart, [time.strftime(label, to_tm(k)) for k in chart]),
+        "stats": curr,
+        "window": {"start": time.strftime("%Y-%m-%dT%H:%M:%S", to_tm(start)),
+                   "end": time.strftime("%Y-%m-%dT%H:%M:%S", to_tm(end)), "bucket": bucket, "source": name},
+        "insights": generate_objective_insights(curr, {}, None)
+    }
+
+STREAM_SCAN = """
+    SELECT id, ts, temp_c, humidity, pressure_hpa, wind_speed_kph, gust_kph, rain_mm, rain_rate_mmh, wind_dir_voltage,
+           station_id
+    FROM weather_data WHERE id > ? AND id <= ? AND ts IS NOT NULL ORDER BY id DESC LIMIT ?
+"""
+TODAY_SCAN = f"""
+    SELECT rain_sum, temp_min, temp_max, gust_max, wind_max FROM weather_daily
+    WHERE station_id = ? AND bucket = (SELECT {rollups.TABLES['weather_daily']} FROM (SELECT ? AS ts))
+"""
+
+def reading(r, today=None):
+    out = {
+        "id": r['id'], "station": r['station_id'], "ts": r['ts'], "label": time.strftime("%H:%M", time.localtime(r['ts'])),
+        "temp": r['temp_c'], "hum": r['humidity'], "pres": r['pressure_hpa'], "wind": r['wind_speed_kph'],
+        "gust": _hi(r['gust_kph'], r['wind_speed_kph']), "rain": r['rain_mm'], "rate": r['rain_rate_mmh'],
+        "dir": wind.cardinal(r['wind_dir_voltage'] or 0),
+        "dew_point": calculate_dew_point(r['temp_c'], r['humidity'])
+    }
+    if today is not None:
+        out["today"] = {"rain": today['rain_sum'] or 0, "min_temp": today['temp_min'], "max_temp": today['temp_max'],
+                        "max_gust": _hi(today['gust_max'], today['wind_max'])}
+    return out
+
+def stream_event(r, today=None):
+    return r['id'], f"id: {r['id']}\nevent: reading\ndata: {json.dumps(reading(r, today))}\n\n"
+
+def read_rows(conn, after, upto, limit=STREAM_BACKLOG):
+    # newest `limit` rows in (after, upto], oldest first
+    return conn.execute(STREAM_SCAN, (after, upto, limit)).fetchall()[::-1]
+
+class Feed:
+    """One watcher thread finds new rows and fans them out to every /api/v2/stream client.
+
+    Each new row costs one query and one json.dumps however many phones are connected.
+    Every row with id > floor is in `events`; older cursors are filled in from the db.
+    """
+    def __init__(self, backlog):
+        self.backlog = backlog
+        self.events = deque()  # (id, event text), oldest first
+        self.floor = self.last = None
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        """The first caller does the first poll and starts the watcher; callers arriving meanwhile wait
+        for it, and retry the poll themselves if it failed."""
+        with self.cond:
+            while self.thread is not None and self.last is None: self.cond.wait()
+            if self.thread is not None: return
+            self.thread = threading.Thread(target=self.watch, daemon=True)
+        try: self.poll()
+        except Exception:
+            with self.cond:
+                self.thread = None  # e.g. db locked or missing at boot
+                self.cond.notify_all()
+            raise
+        with self.cond: self.cond.notify_all()
+        self.thread.start()
+
+    def watch(self):
+        while True:
+            time.sleep(STREAM_POLL)
+            try: self.poll()
+            except sqlite3.Error as e: print(f"Stream watcher: {e}")
+
+    def poll(self):
+        conn = db_pool.acquire()
+        try:
+            if self.last is None:
+                self.floor = self.last = conn.execute("SELECT MAX(id) FROM weather_data").fetchone()[0] or 0
+                return
+            rows = read_rows(conn, self.last, 2 ** 62, self.backlog)
+            today = conn.execute(TODAY_SCAN, (rows[-1]['station_id'], rows[-1]['ts'])).fetchone() if rows else None
+        finally:
+            db_pool.release(conn)
+        if not rows: return
+        events = [stream_event(r) for r in rows[:-1]] + [stream_event(rows[-1], today)]
+        with self.cond:
+            if len(rows) >= self.backlog:  # a burst bigger than the backlog, e.g. a replayed journal
+                self.events.clear()
+                self.floor = rows[0]['id'] - 1
+            for e in events:
+                if len(self.events) >= self.backlog: self.floor = self.events.popleft()[0]
+                self.events.append(e)
+            self.last = events[-1][0]
+            self.cond.notify_all()
+
+    def backfill(self, after, upto):
+        conn = db_pool.acquire()
+        try: return [stream_event(r) for r in read_rows(conn, after, upto)]
+        finally: db_pool.release(conn)
+
+    def newer(self, cur):
+        # walk back from the newest event, so each wake-up costs only the new rows
+        out = []
+        for e in reversed(self.events):
+            if e[0] <= cur: break
+            out.append(e)
+        return out[::-1]
+
+    def stream(self, since=None):
+        """SSE text for readings after id `since` (default: from now on), then each new one as it lands."""
+        with self.cond: cur = self.last if since is None else min(since, self.last)
+        while True:
+            with self.cond:
+                if self.last <= cur: self.cond.wait(STREAM_KEEPALIVE)
+                floor = self.floor
+                pending = self.newer(cur)
+            if cur < floor: pending = self.backfill(cur, floor) + pending
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            for _, text in pending: yield text
+            cur = pending[-1][0]
+
+feed = Feed(STREAM_BACKLOG)
+
+@app.route('/api/v2/stream')
+def stream():
+    # EventSource resends the last id it saw when it reconnects
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None: since = request.args.get('since', type=int)
+    try: feed.start()
+    except sqlite3.Error as e:
+        print(f"Stream start: {e}")
+        return jsonify({"status": "error", "message": "database unavailable, retry"}), 503
+    resp = Response(feed.stream(since), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+LATEST_SCAN = """
+    SELECT id, ts, temp_c, humidity, pressure_hpa, wind_speed_kph, gust_kph, rain_mm, rain_rate_mmh, wind_dir_voltage,
+           station_id
+    FROM weather_data WHERE station_id = ? ORDER BY ts DESC LIMIT 1
+"""
+
+@app.route('/api/v2/stations')
+def stations():
+    return cached_json(build_stations)
+
+def build_stations(conn, now=None):
+    """Every station's newest reading and today's totals side by side, one index probe each."""
+    now = int(now or time.time())
+    out = []
+    for (station,) in conn.execute("SELECT DISTINCT station_id FROM weather_daily").fetchall():
+        r = conn.execute(LATEST_SCAN, (station,)).fetchone()
+        if r is not None: out.append(reading(r, conn.execute(TODAY_SCAN, (station, now)).fetchone()))
+    return {"stations": out}
+
+live = current.Reader(CURRENT_PATH)
+
+@app.route('/api/v2/current')
+def current_conditions():
+    """Header cards and status dots: newest reading, last 24h stats and sensor health. Served from the
+    logger's shared snapshot without touching the db; the db answers only when the logger is not publishing."""
+    station = station_arg()
+    snap = live.read() if station == rollups.LOCAL_STATION else None
+    if snap is None: return cached_json(lambda conn: build_current(conn, station=station))
+    r = {**snap['reading'], 'id': None, 'station_id': station}
+    stats = {k: v or 0 for k, v in snap['stats'].items() if k != 'n'}
+    stats['dew_point'] = calculate_dew_point(stats['avg_temp'], stats['avg_hum'])
+    resp = jsonify(current_body(r, stats, {**snap['health'], "last_read": snap['last_read']}, "logger"))
+    resp.headers['Cache-Control'] = 'no-store'  # changes every minute and costs nothing to rebuild
+    return resp
+
+def current_body(r, stats, health, source):
+    volts = (r['wind_dir_voltage'] if r else 0) or 0
+    return {"reading": reading(r) if r else None, "stats": stats, "latest_dir": wind.cardinal(volts),
+            "wind_ok": volts > 0.1 or stats['max_wind'] > 0, "health": health, "source": source}
+
+def build_current(conn, now=None, station=rollups.LOCAL_STATION):
+    start = int((now or time.time()) - 86400)
+    _, agg, _, _ = summarize_window(conn.execute(RAW_SCAN, (station, start)), start)
+    return current_body(conn.execute(LATEST_SCAN, (station,)).fetchone(), window_stats(agg), None, "db")
+
+def parse_batch(body, encoding=None):
+    """(station, seq, rows) from an uploader's JSON body, gzip or plain; ValueError if malformed."""
+    if encoding == 'gzip':
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try: body = d.decompress(body, INGEST_MAX_BYTES)
+        except zlib.error as e: raise ValueError(f"bad gzip: {e}")
+        if d.unconsumed_tail: raise ValueError("batch too large")
+    batch = json.loads(body)
+    if not isinstance(batch, dict): raise ValueError("batch must be an object")
+    station, seq, rows = batch.get('station'), batch.get('seq'), batch.get('rows')
+    if not isinstance(station, str) or not STATION_RE.fullmatch(station) or station == rollups.LOCAL_STATION:
+        raise ValueError(f"bad station {station!r}")
+    if not isinstance(seq, int) or seq < 1: raise ValueError("seq must be a positive integer")
+    if not isinstance(rows, list) or len(rows) > INGEST_MAX_ROWS: raise ValueError(f"rows must be a list of at most {INGEST_MAX_ROWS}")
+    for r in rows:
+        if not isinstance(r, list) or not 1 <= len(r) <= len(writer.COLUMNS) or not isinstance(r[0], int) \
+                or not all(v is None or isinstance(v, (int, float)) for v in r):
+            raise ValueError(f"bad row {r!r}, expected [{', '.join(writer.COLUMNS)}]")
+    return station, seq, rows
+
+ingest_lock = threading.Lock()  # one writer at a time from this process; the logger waits on SQLite's lock
+
+@app.route('/api/v2/ingest', methods=['GET', 'POST'])
+def ingest():
+    """Batches from remote stations (uploader.py): {"station", "seq", "rows": [[ts, temp_c, ...]]} with rows in
+    writer.COLUMNS order. A seq at or below the last one accepted is a resend and is not stored again.
+    GET ?station= returns that last seq, where the uploader resumes."""
+    # the captive portal Wi-Fi is open, so without a token nobody gets to write
+    if not INGEST_TOKEN: return jsonify({"status": "error", "message": "ingest is off, set INGEST_TOKEN"}), 404
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {INGEST_TOKEN}"):
+        return jsonify({"status": "error", "message": "bad token"}), 401
+    if request.method == 'GET':
+        station = request.args.get('station', '')
+        return jsonify({"station": station, "seq": writer.last_seq(get_db(), station)})
+    if (request.content_length or 0) > INGEST_MAX_BYTES:
+        return jsonify({"status": "error", "message": "batch too large"}), 413
+    try:
+        station, seq, rows = parse_batch(request.get_data(), request.headers.get('Content-Encoding'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    with ingest_lock:
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        try:
+            n = writer.ingest(conn, station, seq, rows)
+            last = writer.last_seq(conn, station)
+        except sqlite3.Error as e:
+            print(f"Ingest from {station}: {e}")
+            return jsonify({"status": "error", "message": "database busy, retry"}), 503
+        finally:
+            conn.close()
+    if n is None: return jsonify({"status": "duplicate", "rows": 0, "seq": last})
+    metrics.REGISTRY.counter("ingest_rows_total", "Rows received from remote stations", station=station).inc(n)
+    return jsonify({"status": "ok", "rows": n, "seq": last})
 
 @app.route('/api/sync-time', methods=['POST'])
 def sync_time():
@@ -172,27 +780,219 @@ def sync_time():
         print(f"Time Sync Error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+def parse_export_time(value, is_end=False):
+    # local time to epoch; bare dates are whole days, so end=2024-05-31 includes the 31st
+    if not value: return None
+    dt = datetime.datetime.fromisoformat(value)
+    if len(value) == 10 and is_end: dt += timedelta(days=1)
+    return int(dt.timestamp())
+
+history = archive.Archive(ARCHIVE_DIR)
+
+def export_rows(conn, cols, start, end, station=None):
+    # archived months come from the column files (only the asked-for columns are read), merged by ts
+    # with raw rows that reached the db after their month was written (journal replay, uploader
+    # backlogs) until compact.py adds them to the partition; everything else from weather_data,
+    # whose raw rows compact.py may have deleted
+    cursor = start
+    for _, meta in history.partitions(start, end):
+        lo, hi = max(meta["start"], cursor or 0), meta["end"] if end is None else min(meta["end"], end)
+        if lo >= hi: continue
+        if cursor is None or cursor < lo: yield from raw_rows(conn, cols, cursor, lo, station)
+        archived = history.rows(cols + ["ts"], lo, hi, EXPORT_BATCH, station)
+        late = raw_rows(conn, cols + ["ts"], lo, hi, station, meta["columns"]["id"]["max"])
+        for row in heapq.merge(archived, late, key=lambda r: r[-1]): yield row[:-1]
+        cursor = hi
+    if end is None or cursor is None or cursor < end: yield from raw_rows(conn, cols, cursor, end, station)
+
+def raw_rows(conn, cols, start, end, station=None, after_id=None):
+    where, args = [], []
+    if station: where.append("station_id = ?"); args.append(station)
+    if start: where.append("ts >= ?"); args.append(start)
+    if end: where.append("ts < ?"); args.append(end)
+    if after_id is not None: where.append("id > ?"); args.append(after_id)
+    where = ("WHERE " + " AND ".join(where)) if where else ""
+    # same fallback as the archive for rows stored without a timestamp
+    select = ", ".join("COALESCE(timestamp, datetime(ts, 'unixepoch'))" if c == "timestamp" else c for c in cols)
+    cur = conn.execute(f"SELECT {select} FROM weather_data {where} ORDER BY ts", args)
+    while True:
+        batch = cur.fetchmany(EXPORT_BATCH)
+        if not batch: break
+        yield from batch
+
+def export_csv(cols, rows):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(cols)
+    for row in rows:
+        w.writerow(row)
+        if buf.tell() > 65536:
+            yield buf.getvalue()
+            buf.seek(0); buf.truncate()
+    yield buf.getvalue()
+
+def export_ndjson(cols, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(cols, row))) + "\n"
+
 @app.route('/export')
 def export():
-    conn = get_db()
-    df = pd.read_sql_query("SELECT * FROM weather_data", conn)
-    conn.close()
-    out = io.BytesIO()
-    with pd.ExcelWriter(out, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
+    fmt = request.args.get('format', 'xlsx')
+    cols = request.args.get('columns')
+    cols = [c.strip() for c in cols.split(',')] if cols else EXPORT_COLUMNS
+    if fmt not in ('xlsx', 'csv', 'ndjson') or not set(cols) <= set(EXPORT_COLUMNS):
+        return jsonify({"status": "error", "message": "bad format or columns"}), 400
+    try:
+        start = parse_export_time(request.args.get('start'))
+        end = parse_export_time(request.args.get('end'), is_end=True)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # all stations unless ?station= is given, station_id tells them apart
+    rows = export_rows(get_db(), cols, start, end, request.args.get('station'))
+    name = f"weather_data.{fmt}"
+    # stream_with_context holds the pooled connection until the last row is sent
+    if fmt == 'csv':
+        return Response(stream_with_context(export_csv(cols, rows)), mimetype='text/csv',
+                        headers={"Content-Disposition": f"attachment; filename={name}"})
+    if fmt == 'ndjson':
+        return Response(stream_with_context(export_ndjson(cols, rows)), mimetype='application/x-ndjson',
+                        headers={"Content-Disposition": f"attachment; filename={name}"})
+
+    # write-only workbook streams rows to disk, then the file is sent in chunks;
+    # openpyxl is imported on the first xlsx download, not at startup
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(cols)
+    for row in rows: ws.append(list(row))
+    out = tempfile.TemporaryFile()
+    wb.save(out)
     out.seek(0)
-    return send_file(out, download_name="weather_data.xlsx", as_attachment=True)
+    return send_file(out, download_name=name, as_attachment=True)
+
+SQL_HISTS = {}  # statement text -> its db_query_seconds histogram; the app runs a fixed set of statements
+
+def sql_hist(sql):
+    hist = SQL_HISTS.get(sql)
+    if hist is None:
+        hist = SQL_HISTS[sql] = metrics.REGISTRY.histogram("db_query_seconds", "SQL execute time to the first row",
+                                                           metrics.SQL_BUCKETS, sql=" ".join(sql.split())[:80])
+    return hist
+
+class TimedConnection(sqlite3.Connection):
+    """Times every execute() into db_query_seconds. Rows fetched later are not counted."""
+    def execute(self, sql, *args):
+        t = time.perf_counter()
+        try: return super().execute(sql, *args)
+        finally: sql_hist(sql).observe(time.perf_counter() - t)
+
+class ConnectionPool:
+    """Read-only connections opened and tuned once, then handed from request to request."""
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.LifoQueue()  # most recently used first, its page cache is warm
+        self.lock = threading.Lock()
+        self.conns = set()
+
+    def connect(self):
+        conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True,
+                               check_same_thread=False, cached_statements=128, factory=TimedConnection)
+        conn.row_factory = sqlite3.Row
+        for pragma in DB_PRAGMAS: conn.execute(pragma)
+        with self.lock: self.conns.add(conn)
+        return conn
+
+    def discard(self, conn):
+        with self.lock: self.conns.discard(conn)
+        try: conn.close()
+        except sqlite3.Error: pass
+
+    def acquire(self):
+        while True:
+            try: conn = self.idle.get_nowait()
+            except queue.Empty: return self.connect()
+            try:
+                conn.execute("SELECT 1")  # health check, e.g. db file replaced under us
+                return conn
+            except sqlite3.Error:
+                self.discard(conn)
+
+    def release(self, conn):
+        if conn.in_transaction: conn.rollback()
+        if self.idle.qsize() < self.size: self.idle.put(conn)
+        else: self.discard(conn)
+
+    def close_all(self):
+        with self.lock: conns, self.conns = self.conns, set()
+        for conn in conns:
+            try: conn.close()
+            except sqlite3.Error: pass
+
+db_pool = ConnectionPool(DB_POOL_SIZE)
+atexit.register(db_pool.close_all)
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # one pooled connection per request, handed back in release_db
+    if 'db' not in g: g.db = db_pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop('db', None)
+    if conn is not None: db_pool.release(conn)
+
+class HitLog:
+    """Counts captive portal hits and prints one summary line per interval, not one per hit."""
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.last = time.monotonic()
+
+    def hit(self, kind):
+        with self.lock:
+            self.counts[kind] += 1
+            now = time.monotonic()
+            if now - self.last < self.interval: return
+            counts, self.counts, self.last = self.counts, Counter(), now
+        print("Captive Portal Hits: " + ", ".join(f"{k} x{n}" for k, n in counts.most_common()))
+
+hit_log = HitLog(HIT_LOG_INTERVAL)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def catch_all(path):
-    print(f"Captive Portal Hit: /{path}")
-    return render_template_string(HTML_TEMPLATE)
+    path = path.lower()
+    if path in PROBE_PATHS:
+        # a redirect instead of the expected answer opens the portal; the popup then loads the page
+        hit_log.hit(path)
+        return Response(status=302, headers={'Location': '/', 'Cache-Control': 'no-store'})
+    if path.endswith(ASSET_EXTS):
+        hit_log.hit('asset')
+        return Response(status=404)
+    hit_log.hit('page')
+    raw, gz, etag = PAGE
+    return not_modified(etag) or send_body(raw, gz, 'text/html', etag)
+
+@app.after_request
+def compress_static(resp):
+    # static/chart.js is sent as a file; keep its gzip bytes per file version (Flask's etag)
+    if request.endpoint != 'static' or resp.status_code != 200 or not accepts_gzip(): return resp
+    tag, _ = resp.get_etag()
+    gz = gzip_cache.get(request.path, tag)
+    if gz is None:
+        resp.direct_passthrough = False
+        gz = compress(resp.get_data())
+        gzip_cache.put(request.path, tag, gz)
+    if gz is None: return resp
+    if hasattr(resp.response, 'close'): resp.response.close()  # the unread file on a cache hit
+    resp.direct_passthrough = False
+    resp.set_data(gz)
+    resp.headers['Content-Encoding'] = 'gzip'
+    resp.set_etag(tag, weak=True)
+    resp.vary.add('Accept-Encoding')
+    return resp
 
 # html (provided in part by Gemini 3 Pro Preview)
 HTML_TEMPLATE = """
@@ -284,12 +1084,12 @@ HTML_TEMPLATE = """
         <div class="card c-temp">
             <div class="card-head"><span class="card-lbl">Temp</span> 🌡️</div>
             <div class="card-val" id="v_temp">--</div>
-            <div class="card-sub">Dew Point: <span id="v_dew">--</span></div>
+            <div class="card-sub">Dew Point: <span id="v_dew">--</span> • <span id="v_temp_today">--</span></div>
         </div>
         <div class="card c-rain">
             <div class="card-head"><span class="card-lbl">Rain</span> ☔</div>
             <div class="card-val" id="v_rain">--</div>
-            <div class="card-sub">Last 24h</div>
+            <div class="card-sub">Last 24h • <span id="v_today">Today --</span></div>
         </div>
         <div class="card c-wind">
             <div class="card-head"><span class="card-lbl">Wind</span> 💨</div>
@@ -322,7 +1122,7 @@ HTML_TEMPLATE = """
     </div>
 
     <div class="footer">
-        <a href="/export" class="btn-dl">Download CSV/Excel</a>
+        <a href="/export" class="btn-dl">Download Excel</a> • <a href="/export?format=csv" class="btn-dl">CSV</a>
     </div>
 </div>
 
@@ -330,6 +1130,9 @@ HTML_TEMPLATE = """
     let myChart;
     let currentMode = 'climate';
     let globalData = null;
+    // a hub shows one station at a time, /?station=greenhouse; the stream carries them all
+    const station = new URLSearchParams(location.search).get('station') || 'local';
+    const LOG_INTERVAL = 60;  // seconds, logger.py
 
     async function syncTime() {
         const banner = document.getElementById('sync-banner');
@@ -417,25 +1220,90 @@ HTML_TEMPLATE = """
     async function fetchData() {
         const range = document.getElementById('timeRange').value;
         try {
-            const res = await fetch(`/api/v2/data?range=${range}`);
+            // rounded so phones of similar width share one cached response
+            const points = Math.round(document.getElementById('mainChart').clientWidth / 50) * 50 || 300;
+            const res = await fetch(`/api/v2/data?range=${range}&points=${points}&station=${encodeURIComponent(station)}`);
             globalData = await res.json();
             updateUI(globalData);
             renderChart();
+            openStream(globalData.last_id);
+            if (range === '24h') fetchCurrent();
         } catch(e) { console.error("Fetch failed", e); }
     }
 
+    async function fetchCurrent() {
+        // the logger's live snapshot: status dots always, the cards too while they show the last 24h
+        try {
+            const res = await fetch(`/api/v2/current?station=${encodeURIComponent(station)}`);
+            const cur = await res.json();
+            const h = cur.health, now = Date.now() / 1000;
+            // remote rows also wait for their logger's batch (up to 5 min) and the next upload
+            const stale = (station === 'local' ? 3 : 10) * LOG_INTERVAL;
+            updateStatus('st_sys', !!cur.reading && now - cur.reading.ts < stale);
+            // the logger publishes after failed reads too: an old last_read means the sensors stopped answering
+            const reads = !h || (h.last_read !== null && now - h.last_read <= 2 * LOG_INTERVAL);
+            updateStatus('st_env', reads && (!h || h.bme280) && cur.stats.avg_pres > 800);
+            updateStatus('st_wnd', reads && (!h || h.ads1015) && cur.wind_ok);
+            document.getElementById('v_dir').innerText = cur.latest_dir;
+            if (document.getElementById('timeRange').value === '24h') updateCards(cur.stats);
+        } catch(e) { console.error("Current fetch failed", e); }
+    }
+
+    let stream;
+    function openStream(since) {
+        // one live feed for the page; it reconnects by itself and resumes from the last id it saw
+        if (stream || !window.EventSource) return;
+        stream = new EventSource(`/api/v2/stream?since=${since || 0}`);
+        stream.addEventListener('reading', e => addReading(JSON.parse(e.data)));
+    }
+
+    function addReading(r) {
+        if (r.station !== station) return;
+        document.getElementById('v_dir').innerText = r.dir;
+        if (r.today) {
+            const t = r.today;
+            document.getElementById('v_today').innerText = `Today ${t.rain.toFixed(1)}mm`;
+            if (t.min_temp !== null) document.getElementById('v_temp_today').innerText = `${t.min_temp.toFixed(1)}° / ${t.max_temp.toFixed(1)}°`;
+        }
+        if (!globalData || r.id <= globalData.last_id) return;
+        globalData.last_id = r.id;
+        if (globalData.next_bucket === null) return;
+        foldReading(globalData.chart, r);
+        renderChart();
+    }
+
+    function foldReading(d, r) {
+        // chart points are merged buckets, not minutes: a reading joins the newest point, or starts
+        // the next one once it crosses next_bucket, and the oldest point slides out of the window
+        if (r.ts >= globalData.next_bucket) {
+            let start = globalData.next_bucket;
+            while (r.ts >= start + globalData.point_secs) start += globalData.point_secs;
+            globalData.next_bucket = start + globalData.point_secs;
+            d.labels.push(pointLabel(start));
+            ['temp', 'hum', 'pres', 'wind', 'gust'].forEach(k => d[k].push(null));
+            d.rain.push(0); d.n.push(0);
+            Object.values(d).forEach(series => series.shift());
+        }
+        const i = d.labels.length - 1, n = d.n[i];
+        // as the server's averages: sum over n, a missing value adds nothing but still counts
+        ['temp', 'hum', 'pres', 'wind'].forEach(k => { d[k][i] = ((d[k][i] || 0) * n + (r[k] || 0)) / (n + 1); });
+        if (r.gust !== null && (d.gust[i] === null || r.gust > d.gust[i])) d.gust[i] = r.gust;
+        d.rain[i] += r.rain || 0;
+        d.n[i] = n + 1;
+    }
+
+    function pointLabel(ts) {
+        // the server's labels: "%H:%M" for 24h, "%m-%d %H:00" for the hourly ranges
+        const t = new Date(ts * 1000), p = v => String(v).padStart(2, '0');
+        if (document.getElementById('timeRange').value === '24h') return `${p(t.getHours())}:${p(t.getMinutes())}`;
+        return `${p(t.getMonth() + 1)}-${p(t.getDate())} ${p(t.getHours())}:00`;
+    }
+
     function updateUI(data) {
-        const s = data.stats;
-        document.getElementById('v_temp').innerText = s.avg_temp.toFixed(1) + '°';
-        document.getElementById('v_dew').innerText = s.dew_point ? s.dew_point.toFixed(1) + '°' : '--';
-        document.getElementById('v_rain').innerText = s.total_rain.toFixed(1) + 'mm';
-        document.getElementById('v_wind').innerText = s.avg_wind.toFixed(1);
-        document.getElementById('v_gust').innerText = s.max_wind.toFixed(1);
+        updateCards(data.stats);
         document.getElementById('v_dir').innerText = data.latest_dir;
-        document.getElementById('v_pres').innerText = s.avg_pres.toFixed(0);
-        document.getElementById('v_hum').innerText = s.avg_hum.toFixed(0) + '%';
         updateStatus('st_sys', true);
-        updateStatus('st_env', s.avg_pres > 800); 
+        updateStatus('st_env', data.stats.avg_pres > 800);
         updateStatus('st_wnd', data.wind_ok);
         const container = document.getElementById('insight_container');
         container.innerHTML = '';
@@ -445,6 +1313,16 @@ HTML_TEMPLATE = """
         });
     }
 
+    function updateCards(s) {
+        document.getElementById('v_temp').innerText = s.avg_temp.toFixed(1) + '°';
+        document.getElementById('v_dew').innerText = s.dew_point ? s.dew_point.toFixed(1) + '°' : '--';
+        document.getElementById('v_rain').innerText = s.total_rain.toFixed(1) + 'mm';
+        document.getElementById('v_wind').innerText = s.avg_wind.toFixed(1);
+        document.getElementById('v_gust').innerText = s.max_gust.toFixed(1);
+        document.getElementById('v_pres').innerText = s.avg_pres.toFixed(0);
+        document.getElementById('v_hum').innerText = s.avg_hum.toFixed(0) + '%';
+    }
+
     function updateStatus(id, isOk) {
         document.getElementById(id).className = isOk ? 'dot ok' : 'dot err';
     }
@@ -452,10 +1330,20 @@ HTML_TEMPLATE = """
     syncTime();
     initChart();
     fetchData();
+    setInterval(fetchCurrent, 60000);
 </script>
 </body>
 </html>
 """
 
+def render_page():
+    # the page is the same for every request: render and compress it once at startup
+    with app.test_request_context('/'):
+        raw = render_template_string(HTML_TEMPLATE).encode()
+    return raw, compress(raw), f"{zlib.crc32(raw):08x}"
+
+PAGE = render_page()
+
 if __name__ == '__main__':
+    metrics.REGISTRY.write_every(WEB_METRICS_PATH, METRICS_INTERVAL)
     app.run(host='0.0.0.0', port=80)
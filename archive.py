@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import datetime
+
+DB_PATH = "/home/weatherstation/weather_data/weather.db"
+ARCHIVE_DIR = "/home/weatherstation/weather_data/archive"
+
+# raw rows of completed local months as one .npy file per column, archive/year=YYYY/month=MM/
+# numpy (already installed for app.py) instead of pyarrow, a further ~40 MB wheel and well over
+# 100 MB on the SD card for what .npy already gives: a column file memory-maps as is, and
+# _meta.json holds per-column stats for pruning.
+# numpy is imported where the files are read or written: app.py imports this module at startup
+# timestamp is the text column as epoch seconds, so exports round-trip exactly;
+# station_id is a small code into the month's _meta.json "values" list;
+# months archived before station_id existed have no file for it and read as 'local'
+LOCAL_STATION = "local"
+COLUMNS = {
+    "id": "int64", "timestamp": "int64", "ts": "int64",
+    "temp_c": "float64", "humidity": "float64", "pressure_hpa": "float64", "wind_speed_kph": "float64",
+    "rain_mm": "float64", "wind_dir_voltage": "float64", "gust_kph": "float64", "rain_rate_mmh": "float64",
+    "station_id": "uint16"
+}
+# rows stored before the logger set timestamp explicitly may have it NULL, ts is always there
+SELECT = ", ".join("CAST(strftime('%s', COALESCE(timestamp, datetime(ts, 'unixepoch'))) AS INTEGER)" if c == "timestamp" else c
+                   for c in COLUMNS)
+
+def month_start(year, month):
+    # local midnight on the 1st, the same day edges compact.py and the daily rollup use
+    return int(datetime.datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1).timestamp())
+
+def partition_path(root, year, month):
+    return os.path.join(root, f"year={year}", f"month={month:02d}")
+
+def write_month(conn, root, year, month, force=False):
+    """Write one month's raw rows; returns the rows added (0, and no partition, for an empty month).
+
+    A month that is already archived only gets the rows with a higher id than its newest archived
+    row: ones that reached the db late (journal replay, an uploader's backlog). They are merged
+    into the partition's existing columns, since compact.py may have deleted the rest from the db.
+    force rewrites the month from the db alone."""
+    start, end = month_start(year, month), month_start(year, month + 1)
+    path = partition_path(root, year, month)
+    meta_path = os.path.join(path, "_meta.json")
+    after = 0
+    if not force and os.path.exists(meta_path):
+        with open(meta_path) as f: after = json.load(f)["columns"]["id"]["max"]
+    rows = conn.execute(f"SELECT {SELECT} FROM weather_data WHERE ts >= ? AND ts < ? AND id > ? ORDER BY ts",
+                        (start, end, after)).fetchall()
+    if not rows: return 0
+    import numpy as np
+    cols = {}
+    for name, values in zip(COLUMNS, zip(*rows)):
+        if name == "station_id": arr = np.array(values)  # names here, coded on save
+        else: arr = np.array(values, dtype=float if COLUMNS[name] == "float64" else None).astype(COLUMNS[name])
+        if after: arr = np.concatenate([Archive(root).column(path, name, 0, None, load=True), arr])
+        cols[name] = arr
+    order = np.argsort(cols["ts"], kind="stable")
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    meta = {"year": year, "month": month, "start": start, "end": end, "rows": len(order), "columns": {}}
+    for name, arr in cols.items():
+        arr = arr[order]
+        if name == "station_id":
+            values = sorted(set(arr.tolist()))
+            np.save(os.path.join(tmp, name + ".npy"), np.searchsorted(values, arr).astype(COLUMNS[name]))
+            meta["columns"][name] = {"values": values}
+            continue
+        np.save(os.path.join(tmp, name + ".npy"), arr)
+        ok = arr[~np.isnan(arr)] if arr.dtype.kind == "f" else arr
+        meta["columns"][name] = {"min": ok.min().item() if ok.size else None, "max": ok.max().item() if ok.size else None,
+                                 "nulls": int(arr.size - ok.size)}
+    with open(os.path.join(tmp, "_meta.json"), "w") as f: json.dump(meta, f, indent=1)
+    # swap the finished directory in, so readers never see half a month
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return len(rows)
+
+def archive(conn, root=ARCHIVE_DIR, now=None, force=False):
+    """Archive every completed month that still has raw rows, new months whole and archived ones
+    with their late rows. Returns {(y, m): rows added}."""
+    first = conn.execute("SELECT MIN(ts) FROM weather_data").fetchone()[0]
+    if first is None: return {}
+    t = datetime.datetime.fromtimestamp(first)
+    current = datetime.datetime.fromtimestamp(now or time.time())
+    done = {}
+    y, m = t.year, t.month
+    while (y, m) < (current.year, current.month):
+        new = force or not os.path.exists(os.path.join(partition_path(root, y, m), "_meta.json"))
+        n = write_month(conn, root, y, m, force)
+        if n or new: done[y, m] = n
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return done
+
+class Archive:
+    """Read side: partitions pruned by their stats, columns memory-mapped, rows cut with searchsorted on ts."""
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self.metas = {}  # path -> (mtime, meta)
+
+    def partitions(self, start=None, end=None, station=None):
+        """(path, meta) of the months overlapping [start, end) that hold `station`, oldest first."""
+        out = []
+        if not os.path.isdir(self.root): return out
+        for year in sorted(os.listdir(self.root)):
+            ydir = os.path.join(self.root, year)
+            if not year.startswith("year=") or not os.path.isdir(ydir): continue
+            for month in sorted(os.listdir(ydir)):
+                path = os.path.join(ydir, month)
+                meta_path = os.path.join(path, "_meta.json")
+                if month.endswith(".tmp") or not os.path.exists(meta_path): continue
+                mtime = os.path.getmtime(meta_path)
+                hit = self.metas.get(path)
+                if hit is None or hit[0] != mtime:
+                    with open(meta_path) as f: hit = self.metas[path] = (mtime, json.load(f))
+                ts = hit[1]["columns"]["ts"]
+                stations = hit[1]["columns"].get("station_id", {"values": [LOCAL_STATION]})["values"]
+                if (start is None or ts["max"] >= start) and (end is None or ts["min"] < end) and \
+                        (station is None or station in stations):
+                    out.append((path, hit[1]))
+        return out
+
+    def end(self):
+        """Epoch where the archive stops (end of its last month), None if empty."""
+        parts = self.partitions()
+        return parts[-1][1]["end"] if parts else None
+
+    def stations(self, path):
+        with open(os.path.join(path, "_meta.json")) as f: meta = json.load(f)
+        return meta["columns"].get("station_id", {"values": [LOCAL_STATION]})["values"]
+
+    def column(self, path, name, lo, hi, load=False):
+        """One column's rows lo..hi; station_id comes back as names."""
+        import numpy as np
+        f = os.path.join(path, name + ".npy")
+        if name == "station_id":
+            if not os.path.exists(f):
+                n = len(np.load(os.path.join(path, "ts.npy"), mmap_mode="r")[lo:hi])
+                return np.full(n, LOCAL_STATION)
+            codes = np.load(f, mmap_mode="r")[lo:hi]
+            return codes.copy() if codes.dtype.kind == "U" else np.array(self.stations(path))[codes]  # months archived as names
+        return np.load(f, mmap_mode=None if load else "r")[lo:hi]
+
+    def read(self, columns, start=None, end=None, station=None):
+        """Yield {column: array} per partition; arrays are read-only memory maps cut to [start, end)
+        (copies when filtered to one station)."""
+        import numpy as np
+        for path, meta in self.partitions(start, end, station):
+            ts = np.load(os.path.join(path, "ts.npy"), mmap_mode="r")
+            lo = 0 if start is None else int(np.searchsorted(ts, start))
+            hi = len(ts) if end is None else int(np.searchsorted(ts, end))
+            if lo >= hi: continue
+            part = {c: self.column(path, c, lo, hi) for c in columns}
+            values = meta["columns"].get("station_id", {"values": ()})["values"]
+            if station is not None and len(values) > 1:
+                codes = np.load(os.path.join(path, "station_id.npy"), mmap_mode="r")[lo:hi]
+                keep = codes == (station if codes.dtype.kind == "U" else values.index(station))
+                part = {c: v[keep] for c, v in part.items()}
+            yield part
+
+    def rows(self, columns, start=None, end=None, batch=500, station=None):
+        """Tuples in `columns` order, the same values a SELECT on weather_data returns."""
+        for part in self.read(columns, start, end, station):
+            n = len(part[columns[0]])
+            for i in range(0, n, batch):
+                cols = []
+                for c in columns:
+                    vals = part[c][i:i + batch].tolist()
+                    if c == "timestamp": vals = [time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(v)) for v in vals]
+                    elif COLUMNS[c] == "float64": vals = [None if v != v else v for v in vals]  # NaN back to NULL
+                    cols.append(vals)
+                yield from zip(*cols)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Write completed months of raw rows to the column archive.")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--root", default=ARCHIVE_DIR)
+    ap.add_argument("--force", action="store_true", help="rewrite months that are already archived")
+    args = ap.parse_args()
+    conn = sqlite3.connect(args.db, timeout=30)
+    for (y, m), n in archive(conn, args.root, force=args.force).items():
+        print(f"{y}-{m:02d}: {n} rows")
+    conn.close()
+    parts = Archive(args.root).partitions()
+    print(f"{len(parts)} months archived, {sum(p[1]['rows'] for p in parts)} rows")
@@ -0,0 +1 @@
+# hardware-free benchmarks: synthetic databases (synth.py) and the timing runner (run.py)
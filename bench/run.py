@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+import app
+import writer
+from bench import synth
+
+# timed against every database size
+ROUTES = [
+    "/api/v2/data?range=24h", "/api/v2/data?range=7d", "/api/v2/data?range=30d",
+    "/api/v2/windrose?range=24h", "/api/v2/windrose?range=30d",
+    "/export?format=csv", "/export?format=ndjson&columns=ts,temp_c,rain_mm",
+]
+EXPORT_ITERATIONS = 3  # full-table exports are slow on the big sizes
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def percentiles(samples):
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))]
+    return {"p50_ms": round(pick(0.50) * 1000, 3), "p99_ms": round(pick(0.99) * 1000, 3),
+            "max_ms": round(s[-1] * 1000, 3), "n": len(s)}
+
+def in_child(module, *argv):
+    # every step in a fresh interpreter, so ru_maxrss is that step's own peak, not the generator's
+    out = subprocess.run([sys.executable, "-m", module, *map(str, argv)], cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.splitlines()[-1] if out.stdout else ""
+
+@contextlib.contextmanager
+def use_db(path):
+    # point the web tier at another file, with its own pool and response cache; put back on exit
+    saved = app.DB_PATH, app.db_pool, app.api_cache
+    app.DB_PATH, app.db_pool, app.api_cache = path, app.ConnectionPool(app.DB_POOL_SIZE), app.ResponseCache(app.API_CACHE_SIZE)
+    try:
+        yield
+    finally:
+        app.db_pool.close_all()
+        app.DB_PATH, app.db_pool, app.api_cache = saved
+
+def bench_routes(path, iterations):
+    with use_db(path): return time_routes(iterations)
+
+def time_routes(iterations):
+    client = app.app.test_client()
+    out = {}
+    for url in ROUTES:
+        n = EXPORT_ITERATIONS if url.startswith("/export") else iterations
+        cold, warm, size = [], [], 0
+        for _ in range(n):
+            app.api_cache.entries.clear()
+            t = time.perf_counter()
+            resp = client.get(url)
+            size = len(resp.get_data())  # consumes streamed bodies too
+            cold.append(time.perf_counter() - t)
+            if url.startswith("/api"):
+                t = time.perf_counter()
+                client.get(url).get_data()
+                warm.append(time.perf_counter() - t)
+        out[url] = {"status": resp.status_code, "bytes": size, "cold": percentiles(cold)}
+        if warm: out[url]["cached"] = percentiles(warm)
+    out["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return out
+
+def bench_inserts(path, rows, batch_size):
+    # logger write path (journal + executemany + rollups) appended after the synthetic data
+    journal = tempfile.NamedTemporaryFile(suffix=".journal", delete=False).name
+    w = writer.Writer(path, journal, batch_size=batch_size)
+    days = rows // 1440 + 1
+    start = (w.conn.execute("SELECT MAX(ts) FROM weather_data").fetchone()[0] or 0) + 60
+    gen = synth.readings(days, start + 60 * days * 1440, seed=1)
+    lat = []
+    t0 = time.perf_counter()
+    for _, row in zip(range(rows), gen):
+        t = time.perf_counter()
+        w.add(row)
+        lat.append(time.perf_counter() - t)
+    w.close()
+    total = time.perf_counter() - t0
+    os.remove(journal)
+    return {"rows": rows, "batch_size": batch_size, "rows_per_s": round(rows / total, 1),
+            "add": percentiles(lat), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Time the dashboard routes and logger write path on synthetic data.")
+    ap.add_argument("--sizes", default="1m,1y", help=f"comma list of {', '.join(synth.SIZES)}")
+    ap.add_argument("--workdir", default=tempfile.gettempdir(), help="where the generated databases go")
+    ap.add_argument("--iterations", type=int, default=50)
+    ap.add_argument("--insert-rows", type=int, default=2000)
+    ap.add_argument("--batch-size", type=int, default=5)
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    ap.add_argument("--measure", choices=("routes", "inserts"), help=argparse.SUPPRESS)  # one step, run by in_child
+    ap.add_argument("--db", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.measure == "routes": return print(json.dumps(bench_routes(args.db, args.iterations)))
+    if args.measure == "inserts": return print(json.dumps(bench_inserts(args.db, args.insert_rows, args.batch_size)))
+
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {"python": sys.version.split()[0], "sizes": {}}
+    for size in args.sizes.split(","):
+        path = os.path.join(args.workdir, f"weather_bench_{size}.db")
+        res = report["sizes"][size] = {}
+        # data ends now, since the api windows are relative to the wall clock
+        t = time.perf_counter()
+        in_child("bench.synth", path, synth.SIZES[size], int(time.time()))
+        res["generate_s"] = round(time.perf_counter() - t, 1)
+        res["db_mb"] = round(os.path.getsize(path) / 1e6, 1)
+        res["routes"] = json.loads(in_child("bench.run", "--measure", "routes", "--db", path, "--iterations", args.iterations))
+        res["inserts"] = json.loads(in_child("bench.run", "--measure", "inserts", "--db", path,
+                                             "--insert-rows", args.insert_rows, "--batch-size", args.batch_size))
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix): os.remove(path + suffix)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# cold start of the web tier, each run in a fresh interpreter: import time, the first page and
+# idle RSS, plus which heavy modules were loaded before anyone asked for them
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "openpyxl", "pandas")  # only /export and the 24h wind rose need them
+TOP = 15  # slowest imports listed in the report
+
+CHILD = """
+import sys, json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get('/')
+t2 = time.perf_counter()
+rss = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'): rss = int(line.split()[1]) / 1024
+print(json.dumps({"import_s": t1 - t0, "first_page_ms": (t2 - t1) * 1000, "status": resp.status_code,
+                  "rss_mb": rss, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+def import_times(python=sys.executable):
+    """(module, self us, cumulative us) from -X importtime for `import app`, slowest cumulative first."""
+    out = subprocess.run([python, "-X", "importtime", "-c", "import app"], cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(own), int(cumulative)))
+    return sorted(rows, key=lambda r: -r[2])
+
+def measure(runs=5, python=sys.executable):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([python, "-c", CHILD], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.splitlines()[-1]))
+    times = import_times(python)
+    top = [{"module": m, "self_ms": round(own / 1000, 1), "cumulative_ms": round(cum / 1000, 1)}
+           for m, own, cum in sorted(times, key=lambda r: -r[1])[:TOP]]
+    return {
+        "python": sys.version.split()[0], "runs": runs,
+        "import_s": round(statistics.median(s["import_s"] for s in samples), 3),
+        "first_page_ms": round(statistics.median(s["first_page_ms"] for s in samples), 1),
+        "idle_rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+        "status": samples[-1]["status"],
+        "heavy_loaded": samples[-1]["heavy"],  # should stay empty
+        "importtime_total_ms": round(times[0][2] / 1000, 1) if times else None,
+        "slowest_imports": top
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Time the dashboard's cold start: imports, first page and idle RSS.")
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters to take the median over")
+    ap.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = ap.parse_args(argv)
+    text = json.dumps(measure(args.runs), indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import argparse
+import numpy as np
+import rollups
+import setup_db
+import wind
+
+SIZES = {"1m": 30, "1y": 365, "5y": 5 * 365}
+CHUNK = 50000  # rows per executemany / commit
+
+def readings(days, end, seed=0):
+    """1-minute synthetic rows ending at `end`: diurnal/seasonal temperature, a pressure
+    random walk, gusty wind and Poisson rain events. Yields tuples in writer.COLUMNS order."""
+    rng = np.random.default_rng(seed)
+    n = days * 1440
+    ts = end - 60 * np.arange(n, 0, -1)
+    day = (ts % 86400) / 86400
+    year = (ts % 31557600) / 31557600
+    temp = 12 - 9 * np.cos(2 * np.pi * year) - 5 * np.cos(2 * np.pi * (day - 0.1)) + rng.normal(0, 0.4, n)
+    hum = np.clip(70 - 2.2 * (temp - 12) + rng.normal(0, 4, n), 10, 100)
+    pres = 1013 + np.cumsum(rng.normal(0, 0.02, n))
+    pres = 1013 + (pres - 1013) % 40 - 20  # keep the walk in a sane band
+    speed = rng.gamma(2.0, 3.0, n) * (1 + 0.5 * np.sin(2 * np.pi * (day - 0.3)))
+    gust = speed * rng.uniform(1.2, 2.0, n)
+    # storms start about twice a week and last a few hours
+    rain = np.zeros(n)
+    for start in np.flatnonzero(rng.random(n) < 2 / (7 * 1440)):
+        length = int(rng.integers(30, 360))
+        tips = rng.poisson(rng.uniform(0.1, 1.5), length)
+        rain[start:start + length] = tips[:n - start] * 0.2794
+    volts = rng.choice(wind.VOLTS, n) + rng.normal(0, 0.03, n)
+    cols = (ts, temp.round(2), hum.round(1), pres.round(1), speed.round(2), rain.round(4),
+            volts.round(3), gust.round(2), rain * 60)
+    for i in range(0, n, CHUNK):
+        yield from zip(*(c[i:i + CHUNK].tolist() for c in cols))
+
+def build(path, days, end, seed=0):
+    """Create a database at `path` with the setup_db.py schema and `days` of synthetic data."""
+    if os.path.exists(path): os.remove(path)
+    saved, setup_db.DB_PATH = setup_db.DB_PATH, path
+    try: setup_db.init_db()
+    finally: setup_db.DB_PATH = saved
+    conn = sqlite3.connect(path)
+    q = """INSERT INTO weather_data (ts, temp_c, humidity, pressure_hpa, wind_speed_kph, rain_mm,
+           wind_dir_voltage, gust_kph, rain_rate_mmh) VALUES (?,?,?,?,?,?,?,?,?)"""
+    batch = []
+    for row in readings(days, end, seed):
+        batch.append(row)
+        if len(batch) == CHUNK:
+            conn.executemany(q, batch); conn.commit(); batch = []
+    conn.executemany(q, batch)
+    conn.execute("UPDATE weather_data SET timestamp = datetime(ts, 'unixepoch')")
+    conn.commit()
+    rollups.rebuild(conn)
+    conn.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build a synthetic weather.db (bench.run runs this in its own interpreter).")
+    ap.add_argument("path")
+    ap.add_argument("days", type=int)
+    ap.add_argument("end", type=int, help="epoch seconds of the last row")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    build(args.path, args.days, args.end, args.seed)
@@ -0,0 +1,103 @@
+import os
+import time
+import sqlite3
+import argparse
+import datetime
+import rollups
+import archive
+
+DB_PATH = "/home/weatherstation/weather_data/weather.db"
+
+# retention tiers: raw minute rows, then 10-minute aggregates, then weather_hourly forever
+RAW_DAYS = 90
+TEN_MIN_DAYS = 730
+BATCH = 2000  # rows per transaction; the logger waits at most one batch
+PAUSE = 0.05  # seconds between batches, lets the logger and dashboard in
+VACUUM_PAGES = 1000  # pages released per incremental_vacuum step
+
+def db_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def local_midnight(ts):
+    # cut on a local day boundary so no hourly, daily or 10-minute bucket is split
+    day = datetime.datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(day.timestamp())
+
+def expire_raw(conn, cutoff, batch=BATCH, pause=PAUSE):
+    """Fold raw rows older than cutoff into weather_10min and delete them, one batch per transaction."""
+    moved = 0
+    while True:
+        first, last = conn.execute("""SELECT MIN(id), MAX(id) FROM
+            (SELECT id FROM weather_data WHERE ts < ? ORDER BY ts LIMIT ?)""", (cutoff, batch)).fetchone()
+        if first is None: return moved
+        where, args = "id BETWEEN ? AND ? AND ts < ?", (first, last, cutoff)
+        rollups.fold(conn, rollups.TEN_MIN_TABLE, rollups.TEN_MIN_BUCKET, where, args)
+        moved += conn.execute(f"DELETE FROM weather_data WHERE {where}", args).rowcount
+        conn.commit()
+        time.sleep(pause)
+
+def expire_ten_min(conn, cutoff, batch=BATCH, pause=PAUSE):
+    """Drop 10-minute aggregates older than cutoff; weather_hourly still covers them."""
+    dropped = 0
+    while True:
+        n = conn.execute(f"""DELETE FROM {rollups.TEN_MIN_TABLE} WHERE bucket IN
+            (SELECT bucket FROM {rollups.TEN_MIN_TABLE} WHERE bucket < ? LIMIT ?)""", (cutoff // 600, batch)).rowcount
+        conn.commit()
+        if not n: return dropped
+        dropped += n
+        time.sleep(pause)
+
+def reclaim(conn, pause=PAUSE):
+    """Give free pages back to the filesystem in small steps. Returns False if auto_vacuum is off."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2: return False
+    while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+        conn.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        conn.commit()
+        time.sleep(pause)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return True
+
+def compact(db_path=DB_PATH, raw_days=RAW_DAYS, ten_min_days=TEN_MIN_DAYS, batch=BATCH, pause=PAUSE, now=None,
+            archive_dir=None):
+    now = now or time.time()
+    t0, size0 = time.monotonic(), db_size(db_path)
+    conn = sqlite3.connect(db_path, timeout=30)
+    # completed months go to the column archive before their raw rows are deleted
+    archived = archive.archive(conn, archive_dir, now) if archive_dir else {}
+    moved = expire_raw(conn, local_midnight(now - raw_days * 86400), batch, pause)
+    dropped = expire_ten_min(conn, local_midnight(now - ten_min_days * 86400), batch, pause)
+    vacuumed = reclaim(conn, pause)
+    conn.close()
+    return {
+        "months_archived": len(archived), "raw_rows_moved": moved, "ten_min_rows_dropped": dropped,
+        "incremental_vacuum": vacuumed,
+        "size_before": size0, "size_after": db_size(db_path),
+        "seconds": round(time.monotonic() - t0, 2)
+    }
+
+def enable_incremental_vacuum(db_path=DB_PATH):
+    # databases created before auto_vacuum was set need one full VACUUM; this locks the db
+    # for its whole runtime and needs free space for a second copy, so run it with the logger stopped
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Move expired raw rows into aggregates and reclaim space.")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--raw-days", type=int, default=RAW_DAYS)
+    ap.add_argument("--ten-min-days", type=int, default=TEN_MIN_DAYS)
+    ap.add_argument("--batch", type=int, default=BATCH)
+    ap.add_argument("--archive-dir", default=archive.ARCHIVE_DIR, help="column archive for completed months ('' to skip)")
+    ap.add_argument("--enable-incremental-vacuum", action="store_true",
+                    help="one-off full VACUUM so later runs can shrink the file (stop the logger first)")
+    args = ap.parse_args()
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        print("Incremental vacuum enabled.")
+    r = compact(args.db, args.raw_days, args.ten_min_days, args.batch, archive_dir=args.archive_dir)
+    if r['months_archived']: print(f"Archived {r['months_archived']} completed months to {args.archive_dir}")
+    print(f"Moved {r['raw_rows_moved']} raw rows to 10-minute aggregates, dropped {r['ten_min_rows_dropped']} old aggregates")
+    if not r['incremental_vacuum']: print("auto_vacuum is off, file not shrunk (see --enable-incremental-vacuum)")
+    print(f"Size {r['size_before'] / 1e6:.1f} MB -> {r['size_after'] / 1e6:.1f} MB in {r['seconds']}s")
@@ -0,0 +1,11 @@
+import pytest
+import setup_db
+
+# test_hw.py is the on-device sensor check, not a pytest module
+collect_ignore = ["test_hw.py"]
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(setup_db, "DB_PATH", str(tmp_path / "weather.db"))
+    setup_db.init_db()
+    return setup_db.DB_PATH
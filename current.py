@@ -0,0 +1,127 @@
+import os
+import mmap
+import time
+import struct
+from collections import deque
+from writer import COLUMNS
+
+# current conditions: the logger's newest reading, running 24h stats and sensor health in a small
+# fixed-layout file on tmpfs; app.py maps it read-only and answers the header cards and status
+# dots from it, with no SQL, even while compact.py holds the db
+CURRENT_PATH = "/dev/shm/weather_current"
+WINDOW = 86400  # seconds of readings behind the stats, the dashboard's 24h range
+STALE = 180  # seconds without a publish before readers treat the logger as down
+MAGIC = 0x57435331  # "WCS1", changes with LAYOUT
+HEALTH = ("bme280", "ads1015")
+STATS = ("n", "total_rain", "avg_temp", "max_temp", "min_temp", "max_wind", "avg_wind", "max_gust",
+         "max_rain_rate", "avg_hum", "avg_pres")
+# magic, seq, written, last_read, health flags, newest reading (writer.COLUMNS), stats; NaN is None
+LAYOUT = struct.Struct("<IIdd" + "B" * len(HEALTH) + "d" * len(COLUMNS) + "d" * len(STATS))
+SEQ = struct.Struct("<I")  # at offset 4, odd while a write is in progress
+
+def _f(v):
+    return float("nan") if v is None else float(v)
+
+def _v(x):
+    return None if x != x else x
+
+def window_stats(rows):
+    """Dashboard stats for rows in COLUMNS order, with the same rules as app.Agg: a missing value adds
+    nothing to a sum but its row still counts; gust falls back to the 1-minute mean."""
+    n = len(rows)
+    col = lambda name: [r[COLUMNS.index(name)] for r in rows]
+    temp, wind, gust, rate = col("temp_c"), col("wind_speed_kph"), col("gust_kph"), col("rain_rate_mmh")
+    present = lambda vals: [v for v in vals if v is not None]
+    avg = lambda vals: sum(present(vals)) / n if n else None
+    top = lambda vals: max(present(vals), default=None)
+    return {
+        "n": n, "total_rain": sum(present(col("rain_mm"))), "avg_temp": avg(temp),
+        "max_temp": top(temp), "min_temp": min(present(temp), default=None),
+        "max_wind": top(wind), "avg_wind": avg(wind), "max_gust": top(gust + wind),
+        "max_rain_rate": top(rate), "avg_hum": avg(col("humidity")), "avg_pres": avg(col("pressure_hpa"))
+    }
+
+class Publisher:
+    """Logger side. The stats are recomputed from the window's rows on each publish, about 1440 rows
+    once a minute, so they never drift. Readers retry while the seq is odd or moves (a seqlock).
+    Each reading is added as soon as it is read, so the snapshot runs up to a Writer batch ahead of
+    /api/v2/data and the stream, which only see committed rows; last_read is set on every sensor read."""
+    def __init__(self, path=CURRENT_PATH):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, LAYOUT.size)
+            self.buf = mmap.mmap(fd, LAYOUT.size)
+        finally:
+            os.close(fd)
+        self.seq = 0
+        self.rows = deque()
+        self.last_read = None
+
+    def seed(self, conn):
+        # the last day from the db, so a restarted logger publishes full stats straight away
+        q = f"""SELECT {', '.join(COLUMNS)} FROM weather_data WHERE station_id = 'local'
+                AND ts > (SELECT MAX(ts) FROM weather_data WHERE station_id = 'local') - ? ORDER BY ts"""
+        self.rows.extend(conn.execute(q, (WINDOW,)).fetchall())
+
+    def add(self, row):
+        """One logged reading (a tuple in COLUMNS order)."""
+        self.rows.append(tuple(row))
+        while self.rows[0][0] <= row[0] - WINDOW: self.rows.popleft()
+
+    def publish(self, health):
+        latest = self.rows[-1] if self.rows else (None,) * len(COLUMNS)
+        stats = window_stats(self.rows)
+        self.seq += 2
+        SEQ.pack_into(self.buf, 4, self.seq - 1)
+        LAYOUT.pack_into(self.buf, 0, MAGIC, self.seq - 1, time.time(), _f(self.last_read),
+                         *(bool(health.get(h)) for h in HEALTH), *map(_f, latest), *(_f(stats[s]) for s in STATS))
+        SEQ.pack_into(self.buf, 4, self.seq)
+
+    def close(self):
+        self.buf.close()
+
+class Reader:
+    """Web tier side: maps the file read-only, reopening it if the logger recreated it."""
+    def __init__(self, path=CURRENT_PATH):
+        self.path = path
+        self.buf = self.inode = None
+
+    def open(self):
+        try:
+            st = os.stat(self.path)
+            if st.st_size < LAYOUT.size: return False
+            if self.buf is None or st.st_ino != self.inode:
+                with open(self.path, "rb") as f: self.buf = mmap.mmap(f.fileno(), LAYOUT.size, access=mmap.ACCESS_READ)
+                self.inode = st.st_ino
+            return True
+        except OSError:
+            return False
+
+    def read(self, now=None):
+        """{"written", "last_read", "health", "reading", "stats"}, or None if the logger is not publishing."""
+        for _ in range(2):  # second try reopens, the first map may be of a deleted file
+            snap = self.unpack()
+            if snap is not None and (now or time.time()) - snap["written"] < STALE: return snap
+            self.buf = None
+            if not self.open(): return None
+        return None
+
+    def unpack(self):
+        if self.buf is None: return None
+        for _ in range(100):
+            seq = SEQ.unpack_from(self.buf, 4)[0]
+            if seq % 2: continue
+            values = LAYOUT.unpack_from(self.buf)
+            if SEQ.unpack_from(self.buf, 4)[0] == seq: break
+        else:
+            return None
+        if values[0] != MAGIC: return None
+        i = 4 + len(HEALTH)
+        reading = dict(zip(COLUMNS, map(_v, values[i:i + len(COLUMNS)])))
+        if reading["ts"] is not None: reading["ts"] = int(reading["ts"])
+        return {
+            "written": values[2], "last_read": _v(values[3]),
+            "health": {h: bool(v) for h, v in zip(HEALTH, values[4:i])},
+            "reading": reading,
+            "stats": dict(zip(STATS, map(_v, values[i + len(COLUMNS):])))
+        }
@@ -1,46 +1,123 @@
-import time, sqlite3, board, busio
-from gpiozero import Button
-from adafruit_bme280 import basic as adafruit_bme280
-from adafruit_ads1x15.ads1015 import ADS1015
-from adafruit_ads1x15.analog_in import AnalogIn
+import os
+import time
+import argparse
+import metrics
+from writer import Writer
+from uploader import Uploader
+from current import CURRENT_PATH, Publisher
+from ticks import TickRing, peak_count, min_gap
+from sensors import BACKENDS, HardwareSensors, SimulatedSensors, ReplaySensors, KPH_PER_HZ, MM_PER_TIP
 
 DB_PATH = "/home/weatherstation/weather_data/weather.db"
 LOG_INTERVAL = 60
+BATCH_SIZE = 5  # readings per db commit
+FLUSH_INTERVAL = 300  # seconds, commit at least this often
+CHECKPOINT_INTERVAL = 3600  # seconds between forced WAL checkpoints
+GUST_WINDOW = 3  # seconds, WMO gust averaging
 PIN_WIND = 17  # Pi 3B+ HAT Specific
 PIN_RAIN = 23  # Pi 3B+ HAT Specific
+METRICS_FILE = "logger_metrics.json"  # next to the db; app.py serves it on /metrics
+METRICS_INTERVAL = 60  # seconds between snapshots
+JITTER_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 15, 60)
 
-i2c = busio.I2C(board.SCL, board.SDA)
-try: bme = adafruit_bme280.Adafruit_BME280_I2C(i2c, address=0x77)
-except: bme = None
-try: 
-    ads = ADS1015(i2c, address=0x48)
-    wind_chan = AnalogIn(ads, 0)
-except: wind_chan = None
-
-wind_btn = Button(PIN_WIND, pull_up=True, bounce_time=0.01)
-rain_btn = Button(PIN_RAIN, pull_up=True, bounce_time=0.1)
-wind_count = 0
-rain_count = 0
-
-def w_tick(): global wind_count; wind_count += 1
-def r_tick(): global rain_count; rain_count += 1
-wind_btn.when_pressed = w_tick
-rain_btn.when_pressed = r_tick
-
-print("Logger Running...")
-while True:
-    try:
-        wind_count = 0; rain_count = 0
-        for _ in range(LOG_INTERVAL): time.sleep(1)
-        
-        t = round(bme.temperature, 2) if bme else 0
-        h = round(bme.relative_humidity, 1) if bme else 0
-        p = round(bme.pressure, 1) if bme else 0
-        v = round(wind_chan.voltage, 3) if wind_chan else 0
-        s = round((wind_count / LOG_INTERVAL) * 2.4, 2)
-        r = round(rain_count * 0.2794, 2)
-
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("INSERT INTO weather_data (temp_c, humidity, pressure_hpa, wind_speed_kph, rain_mm, wind_dir_voltage) VALUES (?,?,?,?,?,?)", (t,h,p,s,r,v))
-        conn.commit(); conn.close()
-    except Exception as e: print(e)
+def make_backend(name, source=None, speed=None):
+    if name == "hardware": return HardwareSensors(PIN_WIND, PIN_RAIN)
+    if name == "sim": return SimulatedSensors(1.0 if speed is None else speed)
+    if not source: raise SystemExit("--backend replay needs --source (a weather.db or exported CSV)")
+    return ReplaySensors(source, 0.0 if speed is None else speed)
+
+def run(backend, writer, interval=LOG_INTERVAL, rows=None, snapshot=None, live=None):
+    """Log one row per interval until `rows` are logged or the backend runs dry (hardware and sim never do).
+    With `snapshot`, loop metrics are written there as JSON every METRICS_INTERVAL seconds; with `live`
+    (a current.Publisher), each cycle publishes the current conditions for the dashboard."""
+    wind_ticks = TickRing()
+    rain_ticks = TickRing(256)
+    backend.start(wind_ticks, rain_ticks)
+    reg = metrics.REGISTRY
+    jitter = reg.histogram("logger_cycle_jitter_seconds", "Distance of each cycle from the logging interval", JITTER_BUCKETS)
+    cycles = reg.counter("logger_cycles_total", "Rows logged")
+    failed = reg.counter("logger_cycles_failed_total", "Cycles that raised instead of logging a row")
+    missed = reg.counter("logger_cycles_missed_total", "Intervals that passed without a cycle")
+    speed = getattr(backend, "speed", 1)  # sim/replay run faster; 0 = flat out, no target
+    logged = 0
+    last, last_snapshot = None, time.monotonic()
+    w0, r0 = wind_ticks.count, rain_ticks.count
+    while rows is None or logged < rows:
+        try:
+            elapsed = backend.wait(interval)
+            # the boundary: ticks counted so far belong to the interval that just ended, later
+            # ones to the next; the counters are never reset, so nothing falls in between
+            w1, r1 = wind_ticks.count, rain_ticks.count
+            if not elapsed: return logged
+            now = time.monotonic()
+            if speed and last is not None:
+                target = interval / speed
+                jitter.observe(abs(now - last - target))
+                if now - last > 1.5 * target: missed.inc(round((now - last) / target) - 1)
+            last = now
+            wind_count, rain_count = w1 - w0, r1 - r0
+            gust_count = peak_count(wind_ticks.since(w0, w1), GUST_WINDOW)
+            # peak rain rate from the closest two tips, the last one before this interval included
+            tip_gap = min_gap(sorted(rain_ticks.since(max(r0 - 1, 0), r1))) if r1 > r0 else None
+            w0, r0 = w1, r1
+
+            t, h, p, v = backend.read()
+            if live: live.last_read = time.time()
+            # rates over the measured interval, which is not always exactly LOG_INTERVAL
+            s = round((wind_count / elapsed) * KPH_PER_HZ, 2)
+            g = round((gust_count / GUST_WINDOW) * KPH_PER_HZ, 2)
+            r = round(rain_count * MM_PER_TIP, 2)
+            rr = round(MM_PER_TIP * 3600 / (tip_gap or elapsed), 2) if rain_count else 0.0
+
+            row = (backend.clock(),t,h,p,s,r,v,g,rr)
+            if live: live.add(row)  # shown straight away, the db gets it with the next batch
+            writer.add(row)
+            logged += 1
+            cycles.inc()
+        except Exception as e:
+            failed.inc()
+            print(e)
+        # published after failed cycles too: fresh health with an old last_read shows a sensor fault
+        if live: live.publish(backend.health())
+        if snapshot and time.monotonic() - last_snapshot >= METRICS_INTERVAL:
+            last_snapshot = time.monotonic()
+            try: reg.write(snapshot)
+            except OSError as e: print(f"Metrics snapshot: {e}")
+    return logged
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Log a row of sensor readings every minute.")
+    ap.add_argument("--backend", choices=BACKENDS, default="hardware",
+                    help="hardware: the station HAT; sim: modelled weather; replay: recorded rows")
+    ap.add_argument("--source", help="weather.db or /export CSV to replay")
+    ap.add_argument("--speed", type=float, help="time multiplier for sim/replay, 0 = flat out (default 1 for sim, 0 for replay)")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--rows", type=int, help="stop after this many rows")
+    ap.add_argument("--metrics", help=f"JSON metrics snapshot file, default {METRICS_FILE} next to --db ('' to disable)")
+    ap.add_argument("--current", default=CURRENT_PATH, help="shared current-conditions file for app.py ('' to disable)")
+    ap.add_argument("--upload", metavar="HUB_URL", help="also forward readings to this hub's /api/v2/ingest (see uploader.py)")
+    ap.add_argument("--station", help="this station's name on the hub, needed with --upload")
+    ap.add_argument("--token", help="the hub's INGEST_TOKEN, needed with --upload")
+    args = ap.parse_args(argv)
+    if args.upload and not (args.station and args.token): ap.error("--upload needs --station and --token")
+
+    if args.metrics is None: args.metrics = os.path.join(os.path.dirname(args.db), METRICS_FILE)
+    backend = make_backend(args.backend, args.source, args.speed)
+    # unflushed readings, replayed at startup
+    writer = Writer(args.db, args.db + ".journal", args.batch_size, FLUSH_INTERVAL, CHECKPOINT_INTERVAL)
+    recovered = writer.replay()
+    if recovered: print(f"Recovered {recovered} journaled readings")
+    if args.upload: Uploader(args.upload, args.station, args.db, args.token).start()
+    live = Publisher(args.current) if args.current else None
+    if live: live.seed(writer.conn)
+
+    print(f"Logger Running ({args.backend})...")
+    try: logged = run(backend, writer, rows=args.rows, snapshot=args.metrics, live=live)
+    finally:
+        writer.close()
+        if live: live.close()
+    print(f"Stopped after {logged} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+
+# in-process counters and histograms, rendered as Prometheus text or written as a JSON snapshot
+# the logger has no http server, so it writes snapshots and app.py folds them into /metrics
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+class Counter:
+    kind = "counter"
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, n=1):
+        with self.lock: self.value += n
+
+    def dump(self):
+        return {"value": self.value}
+
+class Gauge(Counter):
+    kind = "gauge"
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    kind = "histogram"
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)  # le: a value on an edge counts in that bucket
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def dump(self):
+        with self.lock: counts, total = list(self.counts), self.sum
+        return {"buckets": list(self.buckets), "counts": counts, "sum": total}
+
+class Timer:
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.t)
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}  # (name, sorted labels) -> metric
+        self.help = {}
+        self.lock = threading.Lock()
+
+    def get(self, cls, name, help, labels, *args):
+        key = (name, tuple(sorted(labels.items())))
+        m = self.metrics.get(key)
+        if m is None:
+            with self.lock:
+                m = self.metrics.get(key)
+                if m is None:
+                    m = self.metrics[key] = cls(*args)
+                    self.help[name] = help
+        return m
+
+    def counter(self, name, help="", **labels): return self.get(Counter, name, help, labels)
+    def gauge(self, name, help="", **labels): return self.get(Gauge, name, help, labels)
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS, **labels): return self.get(Histogram, name, help, labels, buckets)
+    def timer(self, name, help="", buckets=LATENCY_BUCKETS, **labels): return Timer(self.histogram(name, help, buckets, **labels))
+
+    def snapshot(self):
+        out = []
+        for (name, labels), m in list(self.metrics.items()):
+            out.append({"name": name, "help": self.help[name], "type": m.kind, "labels": dict(labels), **m.dump()})
+        return out
+
+    def write(self, path):
+        # written to a temp file and renamed, so a reader never sees half a snapshot
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f: json.dump({"time": time.time(), "metrics": self.snapshot()}, f)
+        os.replace(tmp, path)
+
+    def write_every(self, path, interval):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try: self.write(path)
+                except OSError as e: print(f"Metrics snapshot: {e}")
+        threading.Thread(target=loop, daemon=True).start()
+
+def read_snapshot(path):
+    try:
+        with open(path) as f: return json.load(f)["metrics"]
+    except (OSError, ValueError, KeyError): return []
+
+def _labels(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items: return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def render(snapshot):
+    """Prometheus text exposition (format 0.0.4) of snapshot() entries."""
+    lines, seen = [], set()
+    for m in sorted(snapshot, key=lambda m: m["name"]):
+        name, labels = m["name"], m["labels"]
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {m['help']}")
+            lines.append(f"# TYPE {name} {m['type']}")
+        if m["type"] != "histogram":
+            lines.append(f"{name}{_labels(labels)} {m['value']}")
+            continue
+        running = 0
+        for edge, n in zip(m["buckets"] + ["+Inf"], m["counts"]):
+            running += n
+            lines.append(f"{name}_bucket{_labels(labels, ('le', edge))} {running}")
+        lines.append(f"{name}_sum{_labels(labels)} {m['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {running}")
+    return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
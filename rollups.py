@@ -0,0 +1,94 @@
+from collections import Counter
+import wind
+import agro
+
+# hourly/daily rollups of weather_data, so long ranges never touch raw minute rows
+# averages are sum / n so buckets can be merged without losing weight
+# hourly bucket = ts / 3600 (UTC hour), daily bucket = local calendar day number
+# every rollup row is per station_id; this Pi's own logger writes LOCAL_STATION, /api/v2/ingest the others
+LOCAL_STATION = "local"
+METRICS = {
+    "rain": "rain_mm", "temp": "temp_c", "hum": "humidity",
+    "pres": "pressure_hpa", "wind": "wind_speed_kph",
+    "gust": "gust_kph", "rate": "rain_rate_mmh",
+    # expressions work too: chill_sum/frost_sum count rows in the band, agro.py turns them into hours
+    "chill": "(temp_c >= 0 AND temp_c <= 7.2)", "frost": "(temp_c < 0)"
+}
+TABLES = {
+    "weather_hourly": "ts / 3600",
+    "weather_daily": "CAST(strftime('%s', ts, 'unixepoch', 'localtime') AS INTEGER) / 86400"
+}
+# daily wind rose: sample counts per (day, 16-point sector, speed band), see wind.py
+ROSE_TABLE = "weather_rose_daily"
+# same shape, filled by compact.py from raw rows past retention
+TEN_MIN_TABLE, TEN_MIN_BUCKET = "weather_10min", "ts / 600"
+
+def _cols(fmt):
+    return ", ".join(fmt.format(m=m, c=c) for m, c in METRICS.items())
+
+def create_table(conn, table):
+    cols = _cols("{m}_sum REAL, {m}_min REAL, {m}_max REAL")
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {table} (station_id TEXT NOT NULL, bucket INTEGER NOT NULL,
+                     n INTEGER NOT NULL, {cols}, PRIMARY KEY (station_id, bucket)) WITHOUT ROWID""")
+    # metrics added later become new columns instead of a rebuild that would lose compacted history
+    have = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for col in _cols("{m}_sum,{m}_min,{m}_max").replace(" ", "").split(","):
+        if col not in have: conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} REAL")
+
+def create_tables(conn):
+    for table in TABLES: create_table(conn, table)
+    agro.create_table(conn)
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {ROSE_TABLE} (station_id TEXT NOT NULL, bucket INTEGER, dir INTEGER,
+                     band INTEGER, n INTEGER NOT NULL, PRIMARY KEY (station_id, bucket, dir, band)) WITHOUT ROWID""")
+
+def fold(conn, table, bucket, where, args):
+    """Merge the weather_data rows matching `where` into rollup `table` (caller commits)."""
+    aggs = _cols("SUM({c}), MIN({c}), MAX({c})")
+    merge = _cols("{m}_sum = coalesce({m}_sum + excluded.{m}_sum, {m}_sum, excluded.{m}_sum), "
+                  "{m}_min = coalesce(min({m}_min, excluded.{m}_min), {m}_min, excluded.{m}_min), "
+                  "{m}_max = coalesce(max({m}_max, excluded.{m}_max), {m}_max, excluded.{m}_max)")
+    conn.execute(f"""
+        INSERT INTO {table} SELECT station_id, {bucket}, COUNT(*), {aggs}
+        FROM weather_data WHERE {where} AND ts IS NOT NULL GROUP BY 1, 2
+        ON CONFLICT(station_id, bucket) DO UPDATE SET n = n + excluded.n, {merge}
+    """, args)
+
+def update(conn, first_id, last_id):
+    """Fold weather_data rows first_id..last_id into the rollups (caller commits)."""
+    for table, bucket in TABLES.items():
+        fold(conn, table, bucket, "id BETWEEN ? AND ?", (first_id, last_id))
+    update_rose(conn, first_id, last_id)
+    for (station,) in conn.execute("SELECT DISTINCT station_id FROM weather_data WHERE id BETWEEN ? AND ?", (first_id, last_id)).fetchall():
+        newest = conn.execute("SELECT MAX(bucket) FROM weather_daily WHERE station_id = ?", (station,)).fetchone()[0]
+        if newest is not None: agro.advance(conn, newest, station)
+
+def update_rose(conn, first_id, last_id):
+    counts = Counter()
+    rows = conn.execute(f"""SELECT station_id, {TABLES['weather_daily']}, wind_dir_voltage, wind_speed_kph FROM weather_data
+                            WHERE id BETWEEN ? AND ? AND ts IS NOT NULL""", (first_id, last_id))
+    for station, day, volts, kph in rows:
+        d = wind.direction_index(volts)
+        if d is not None: counts[station, day, d, wind.speed_band(kph)] += 1
+    conn.executemany(f"""INSERT INTO {ROSE_TABLE} VALUES (?, ?, ?, ?, ?)
+                         ON CONFLICT(station_id, bucket, dir, band) DO UPDATE SET n = n + excluded.n""",
+                     [(*k, n) for k, n in counts.items()])
+
+def rebuild(conn, batch=50000):
+    """Recompute the rollups from the raw rows, in id batches so the logger is not locked out.
+
+    Buckets older than the oldest raw row are kept: compact.py has already deleted their
+    rows (it cuts on local midnight, so no bucket is split between the two). The oldest row is
+    found by ts, not id: ingested stations upload their backlog late.
+    """
+    conn.execute("BEGIN IMMEDIATE")  # rows after `last` are the logger's to fold in
+    first, last = conn.execute("SELECT MIN(id), MAX(id) FROM weather_data WHERE ts IS NOT NULL").fetchone()
+    agro.reset(conn)
+    if first is None:  # nothing raw left, every bucket is compacted history
+        conn.commit()
+        return
+    for table, bucket in (*TABLES.items(), (ROSE_TABLE, TABLES['weather_daily'])):
+        conn.execute(f"DELETE FROM {table} WHERE bucket >= (SELECT {bucket} FROM (SELECT MIN(ts) AS ts FROM weather_data))")
+    conn.commit()
+    for start in range(first, last + 1, batch):
+        update(conn, start, min(start + batch - 1, last))
+        conn.commit()
@@ -0,0 +1,181 @@
+import csv
+import math
+import time
+import random
+import sqlite3
+import wind
+import metrics
+
+# sensor backends for logger.py, all with the same shape:
+#   start(wind_ticks, rain_ticks)  hook the two TickRings up to the reed switches
+#   wait(seconds)                  let one logging interval pass and return its true length in
+#                                  seconds; 0 when there is no more data
+#   read()                         (temp_c, humidity, pressure_hpa, wind_dir_voltage), 0 if absent
+#   clock()                        epoch seconds for the row just measured
+#   health()                       {"bme280": bool, "ads1015": bool}
+
+KPH_PER_HZ = 2.4  # anemometer: one switch closure per second = 2.4 kph
+MM_PER_TIP = 0.2794
+
+class HardwareSensors:
+    """BME280 + ADS1015 over I2C and the wind/rain reed switches on GPIO (the station HAT)."""
+    def __init__(self, pin_wind=17, pin_rain=23, addr_bme=0x77, addr_adc=0x48):
+        # imported here so the other backends run on machines without the Pi libraries
+        import board, busio
+        from gpiozero import Button
+        from adafruit_bme280 import basic as adafruit_bme280
+        from adafruit_ads1x15.ads1015 import ADS1015
+        from adafruit_ads1x15.analog_in import AnalogIn
+        i2c = busio.I2C(board.SCL, board.SDA)
+        try: self.bme = adafruit_bme280.Adafruit_BME280_I2C(i2c, address=addr_bme)
+        except Exception: self.bme = None
+        try: self.wind_chan = AnalogIn(ADS1015(i2c, address=addr_adc), 0)
+        except Exception: self.wind_chan = None
+        self.wind_btn = Button(pin_wind, pull_up=True, bounce_time=0.01)
+        self.rain_btn = Button(pin_rain, pull_up=True, bounce_time=0.1)
+
+    def start(self, wind_ticks, rain_ticks):
+        self.wind_btn.when_pressed = wind_ticks.tick
+        self.rain_btn.when_pressed = rain_ticks.tick
+        self.boundary = time.monotonic()
+        self.stamp = int(time.time())
+
+    def wait(self, seconds):
+        """Sleep to the next wall-clock multiple of `seconds` (rows land on :00) in one wakeup.
+        The deadline is monotonic, so time spent reading and writing never accumulates as drift."""
+        left = seconds - time.time() % seconds
+        if left < 1: left += seconds  # too close to the edge: a partial interval would be noise
+        deadline = time.monotonic() + left
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0: break
+            time.sleep(left)  # loops only if woken early
+        now = time.monotonic()
+        elapsed, self.boundary = now - self.boundary, now
+        self.stamp = round(time.time())
+        return elapsed
+
+    def read(self):
+        with metrics.REGISTRY.timer("sensor_read_seconds", "I2C read time per device", device="bme280"):
+            t = round(self.bme.temperature, 2) if self.bme else 0
+            h = round(self.bme.relative_humidity, 1) if self.bme else 0
+            p = round(self.bme.pressure, 1) if self.bme else 0
+        with metrics.REGISTRY.timer("sensor_read_seconds", "I2C read time per device", device="ads1015"):
+            v = round(self.wind_chan.voltage, 3) if self.wind_chan else 0
+        return t, h, p, v
+
+    def clock(self):
+        return self.stamp
+
+    def health(self):
+        return {"bme280": self.bme is not None, "ads1015": self.wind_chan is not None}
+
+class SimulatedSensors:
+    """Model weather on a simulated clock: diurnal temperature, a pressure walk, gusty wind
+    as Poisson anemometer ticks, and occasional showers. speed=0 runs as fast as possible."""
+    def __init__(self, speed=1.0, start=None, seed=None):
+        self.speed = speed
+        self.t = float(start or time.time())
+        self.rng = random.Random(seed)
+        self.pres = 1013.0
+        self.kph = 8.0
+        self.rain_left = 0  # seconds of shower remaining
+        self.volts = wind.VOLTS[0]
+
+    def start(self, wind_ticks, rain_ticks):
+        self.wind_ticks, self.rain_ticks = wind_ticks, rain_ticks
+
+    def wait(self, seconds):
+        rng, end = self.rng, self.t + seconds
+        # mean-reverting wind with short gust bursts; ticks arrive as a Poisson process
+        self.kph = max(0.0, self.kph + 0.2 * (8 - self.kph) + rng.gauss(0, 2))
+        burst = rng.uniform(0, seconds)
+        t = self.t
+        while True:
+            rate = self.kph / KPH_PER_HZ * (2.0 if burst <= t - self.t < burst + 3 else 1.0)
+            if rate <= 0: break
+            t += rng.expovariate(rate)
+            if t >= end: break
+            self.wind_ticks.tick_at(t)
+        if self.rain_left <= 0 and rng.random() < seconds / (3 * 86400):
+            self.rain_left = rng.uniform(1800, 4 * 3600)
+        if self.rain_left > 0:
+            for _ in range(rng.randint(0, 4)): self.rain_ticks.tick_at(rng.uniform(self.t, end))
+            self.rain_left -= seconds
+        if rng.random() < 0.02: self.volts = rng.choice(wind.VOLTS)
+        self.pres += rng.gauss(0, 0.05) + 0.001 * (1013 - self.pres)
+        self.t = end
+        if self.speed: time.sleep(seconds / self.speed)
+        return seconds
+
+    def read(self):
+        lt = time.localtime(self.t)
+        hour = lt.tm_hour + lt.tm_min / 60
+        season = math.cos(2 * math.pi * (lt.tm_yday - 200) / 365)
+        temp = 12 + 9 * season - 5 * math.cos(2 * math.pi * (hour - 3) / 24) + self.rng.gauss(0, 0.3)
+        hum = min(100, max(10, 70 - 2.2 * (temp - 12) + (25 if self.rain_left > 0 else 0) + self.rng.gauss(0, 3)))
+        return round(temp, 2), round(hum, 1), round(self.pres, 1), round(self.volts + self.rng.gauss(0, 0.02), 3)
+
+    def clock(self):
+        return int(self.t)
+
+    def health(self):
+        return {"bme280": True, "ads1015": True}
+
+class ReplaySensors:
+    """Feed recorded rows (a weather.db or an /export CSV) back through the logger.
+
+    Each interval takes the next recorded row: its readings are returned by read(), and its
+    wind speed, gust and rain are turned back into ticks on the recorded clock.
+    speed=0 replays as fast as the write path allows.
+    """
+    FIELDS = ("ts", "temp_c", "humidity", "pressure_hpa", "wind_speed_kph", "rain_mm", "wind_dir_voltage", "gust_kph")
+
+    def __init__(self, source, speed=0.0):
+        self.speed = speed
+        self.rows = self.load(source)
+        self.row = None
+
+    def load(self, source):
+        if source.endswith(".db"):
+            conn = sqlite3.connect(source)
+            have = {r[1] for r in conn.execute("PRAGMA table_info(weather_data)")}
+            cols = ", ".join(f if f in have else f"NULL AS {f}" for f in self.FIELDS)
+            for row in conn.execute(f"SELECT {cols} FROM weather_data WHERE ts IS NOT NULL ORDER BY ts"):
+                yield dict(zip(self.FIELDS, row))
+            conn.close()
+        else:
+            with open(source, newline="") as f:
+                for rec in csv.DictReader(f):
+                    yield {k: float(rec[k]) if rec.get(k) not in (None, "") else None for k in self.FIELDS}
+
+    def start(self, wind_ticks, rain_ticks):
+        self.wind_ticks, self.rain_ticks = wind_ticks, rain_ticks
+
+    def wait(self, seconds):
+        self.row = next(self.rows, None)
+        if self.row is None: return 0
+        end = self.row["ts"]
+        start = end - seconds
+        n = round((self.row["wind_speed_kph"] or 0) / KPH_PER_HZ * seconds)
+        # recorded gust as a 3 s burst at the start, the rest of the ticks spread evenly
+        burst = min(n, round((self.row["gust_kph"] or 0) / KPH_PER_HZ * 3))
+        lead = 3 if burst else 0
+        for i in range(burst): self.wind_ticks.tick_at(start + 3 * i / burst)
+        for i in range(n - burst): self.wind_ticks.tick_at(start + lead + (seconds - lead) * i / (n - burst))
+        tips = round((self.row["rain_mm"] or 0) / MM_PER_TIP)
+        for i in range(tips): self.rain_ticks.tick_at(start + seconds * i / tips)  # evenly, so the rate is the row's mean
+        if self.speed: time.sleep(seconds / self.speed)
+        return seconds
+
+    def read(self):
+        r = self.row
+        return tuple(r[k] or 0 for k in ("temp_c", "humidity", "pressure_hpa", "wind_dir_voltage"))
+
+    def clock(self):
+        return int(self.row["ts"])
+
+    def health(self):
+        return {"bme280": True, "ads1015": True}
+
+BACKENDS = {"hardware": HardwareSensors, "sim": SimulatedSensors, "replay": ReplaySensors}
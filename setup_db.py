@@ -1,17 +1,127 @@
 import sqlite3
 import os
+import rollups
+import agro
+import writer
 DB_PATH = "/home/weatherstation/weather_data/weather.db"
+BATCH = 5000  # rows per backfill transaction, short enough that the logger never waits long
+
+def create_rollups(conn):
+    """hourly/daily rollup tables"""
+    return True
+
+def rebuild_rollups(conn):
+    rollups.create_tables(conn)
+    conn.commit()
+    rollups.rebuild(conn)
+
+def add_epoch_ts(conn):
+    """integer epoch ts column (UTC seconds), rollups keyed by ts"""
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(weather_data)")]
+    if 'ts' not in cols: conn.execute("ALTER TABLE weather_data ADD COLUMN ts INTEGER")
+    conn.commit()
+    # CURRENT_TIMESTAMP text is UTC, so strftime('%s') gives the true epoch
+    first = 1
+    while True:
+        last = conn.execute("SELECT MAX(id) FROM weather_data").fetchone()[0] or 0
+        if first > last: break
+        conn.execute("UPDATE weather_data SET ts = CAST(strftime('%s', timestamp) AS INTEGER) WHERE id BETWEEN ? AND ? AND ts IS NULL",
+                     (first, first + BATCH - 1))
+        conn.commit()
+        first += BATCH
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ts ON weather_data (ts)')
+    conn.execute('DROP INDEX IF EXISTS idx_timestamp')
+    # rollup buckets change from text to integer keys
+    for table in (*rollups.TABLES, rollups.ROSE_TABLE): conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.commit()
+    return True
+
+def add_gust_columns(conn):
+    """gust_kph and rain_rate_mmh columns, rolled up"""
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(weather_data)")]
+    for col in ('gust_kph', 'rain_rate_mmh'):
+        if col not in cols: conn.execute(f"ALTER TABLE weather_data ADD COLUMN {col} REAL")
+    conn.commit()
+    return True
+
+# applied in order, PRAGMA user_version records how many have run;
+# a step returning True changed what the rollups hold, they are rebuilt once at the end
+def create_rose(conn):
+    """daily wind rose rollup"""
+    return True
+
+def create_ten_min(conn):
+    """10-minute aggregate tier for compact.py"""
+    rollups.create_table(conn, rollups.TEN_MIN_TABLE)
+
+def add_agro(conn):
+    """chill/frost rollup metrics and season accumulators (agro.py)"""
+    rollups.create_tables(conn)  # adds the chill/frost columns, creates agro.STATE_TABLE
+    rollups.create_table(conn, rollups.TEN_MIN_TABLE)
+    backfill_chill(conn)
+    return True
+
+def backfill_chill(conn):
+    # compact.py has deleted the raw rows behind older buckets, so their chill/frost counts are estimated
+    # from each 10-minute mean, the whole bucket in or out of the band; days with raw rows are rebuilt
+    # exactly afterwards, and days past TEN_MIN_DAYS have nothing left to estimate from and stay NULL
+    ten, day = rollups.TEN_MIN_TABLE, "CAST(strftime('%s', bucket * 600, 'unixepoch', 'localtime') AS INTEGER) / 86400"
+    band = {m: rollups.METRICS[m].replace("temp_c", "(temp_sum / n)") for m in ("chill", "frost")}
+    conn.execute(f"""UPDATE {ten} SET {', '.join(f"{m}_sum = n * {e}, {m}_min = {e}, {m}_max = {e}" for m, e in band.items())}
+                     WHERE chill_sum IS NULL AND temp_sum IS NOT NULL""")
+    for m in band:
+        conn.execute(f"""UPDATE weather_daily SET ({m}_sum, {m}_min, {m}_max) =
+                         (SELECT SUM({m}_sum), MIN({m}_min), MAX({m}_max) FROM {ten} WHERE {day} = weather_daily.bucket)
+                         WHERE {m}_sum IS NULL""")
+    conn.commit()
+
+def key_by_station(conn, table):
+    # rebuilt with station_id leading the primary key; existing rows, compacted history included, become 'local'
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    if not cols or 'station_id' in cols: return
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_v6")
+    rollups.create_tables(conn)
+    rollups.create_table(conn, rollups.TEN_MIN_TABLE)
+    cols = ", ".join(cols)
+    conn.execute(f"INSERT INTO {table} (station_id, {cols}) SELECT ?, {cols} FROM {table}_v6", (rollups.LOCAL_STATION,))
+    conn.execute(f"DROP TABLE {table}_v6")
+
+def add_station_id(conn):
+    """station_id on readings and rollups, for /api/v2/ingest"""
+    cols = [r[1] for r in conn.execute("PRAGMA table_info(weather_data)")]
+    if 'station_id' not in cols:
+        conn.execute(f"ALTER TABLE weather_data ADD COLUMN station_id TEXT NOT NULL DEFAULT '{rollups.LOCAL_STATION}'")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_station_ts ON weather_data (station_id, ts)')
+    for table in (*rollups.TABLES, rollups.TEN_MIN_TABLE, rollups.ROSE_TABLE): key_by_station(conn, table)
+    # season totals are refolded from weather_daily on the next insert
+    conn.execute(f"DROP TABLE IF EXISTS {agro.STATE_TABLE}")
+    agro.create_table(conn)
+    writer.create_seq_table(conn)
+
+MIGRATIONS = [create_rollups, add_epoch_ts, add_gust_columns, create_rose, create_ten_min, add_agro, add_station_id]
+
+def migrate(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    rebuild = False
+    for i, step in enumerate(MIGRATIONS[version:], version + 1):
+        print(f"Schema v{i}: {step.__doc__}")
+        rebuild = step(conn) or rebuild
+        conn.execute(f"PRAGMA user_version = {i}")
+        conn.commit()
+    if rebuild: rebuild_rollups(conn)
+
 def init_db():
     if not os.path.exists(os.path.dirname(DB_PATH)): os.makedirs(os.path.dirname(DB_PATH))
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    c.execute('PRAGMA auto_vacuum=INCREMENTAL;')  # only takes effect on a new, empty file
     c.execute('PRAGMA journal_mode=WAL;')
     c.execute('''CREATE TABLE IF NOT EXISTS weather_data (
         id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
         temp_c REAL, humidity REAL, pressure_hpa REAL, wind_speed_kph REAL,
         rain_mm REAL, wind_dir_voltage REAL)''')
-    c.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON weather_data (timestamp)')
     conn.commit()
+    migrate(conn)
     conn.close()
     print("DB Initialized.")
 if __name__ == "__main__": init_db()
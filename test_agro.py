@@ -0,0 +1,75 @@
+import sqlite3
+import pytest
+import agro
+import rollups
+import writer
+from writer import Writer
+
+START = 1767225600  # 2026-01-01 00:00 UTC
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    import time
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def reading(i):
+    # one row a minute; a cold snap every few nights and a warm afternoon
+    ts = START + 60 * i
+    hour = (i // 60) % 24
+    temp = -3 + hour * 0.9 + (i // 1440 % 5) * 1.5
+    return (ts, round(temp, 2), 60.0, 1012.0, 7.2, 0.0, 1.2, 9.0, 0.0)
+
+def brute(conn, today):
+    # the same values straight from the raw rows
+    rows = conn.execute("""SELECT (ts / 86400) AS day, MIN(temp_c), MAX(temp_c),
+                                  SUM(temp_c >= 0 AND temp_c <= 7.2), SUM(temp_c < 0)
+                           FROM weather_data WHERE ts / 86400 <= ? GROUP BY day""", (today,)).fetchall()
+    gdd = sum(agro.gdd({"temp_min": lo, "temp_max": hi}) for _, lo, hi, _, _ in rows)
+    return gdd, sum(r[3] for r in rows) / 60, sum(r[4] for r in rows) / 60
+
+def test_running_totals_match_a_full_scan(db):
+    w = Writer(db, db + ".journal", batch_size=30)
+    for i in range(10 * 1440 + 600): w.add(reading(i))  # ten days and ten hours, in logger-sized batches
+    w.close()
+    conn = sqlite3.connect(db)
+    today = START // 86400 + 10
+    through = {r[0]: r[1] for r in conn.execute("SELECT name, through FROM weather_agro")}
+    assert through["gdd"] == today - 1  # completed days are folded, today is read live
+    got = agro.totals(conn, now=START + 10 * 86400 + 36000)
+    gdd, chill, frost = brute(conn, today)
+    assert got["gdd"]["total"] == pytest.approx(gdd, abs=0.01)
+    assert got["chill_hours"]["total"] == pytest.approx(chill, abs=0.01)  # season began Oct 1
+    assert got["frost_hours"]["total"] == pytest.approx(frost, abs=0.01) and frost > 0
+    assert 0 < got["et0"]["today"] < 5 and got["et0"]["total"] > got["et0"]["today"]
+
+    # a rebuild refolds the season from the rebuilt daily rollup
+    before = got
+    rollups.rebuild(conn)
+    assert agro.totals(conn, now=START + 10 * 86400 + 36000) == before
+    conn.close()
+
+def test_chill_hours_follow_the_station_interval(db):
+    # an ingested station logging every 5 minutes: each row is 5 minutes of chill, not one
+    conn = sqlite3.connect(db)
+    writer.insert_rows(conn, [(START + 300 * i, 3.0, 60.0, 1012.0, 0.0, 0.0, 1.2, 0.0, 0.0) for i in range(2 * 288)], "barn")
+    conn.commit()
+    got = agro.totals(conn, now=START + 86400 + 3600, station="barn")
+    assert got["chill_hours"]["total"] == pytest.approx(48) and got["chill_hours"]["today"] == pytest.approx(24)
+    assert agro.row_hours(conn, "nowhere") == agro.ROW_HOURS
+    conn.close()
+
+def test_season_rolls_over():
+    day = agro.local_day(START)
+    assert agro.season_start(day, (1, 1)) == day
+    assert agro.season_start(day - 1, (1, 1)) == day - 365
+    assert agro.season_start(day, (10, 1)) == day - 92
+
+def test_et0_summer_day():
+    # clear mid-latitude July day: FAO-56 puts grass reference ET around 4-6 mm
+    day = {"bucket": agro.local_day(START + 185 * 86400), "n": 1440, "temp_min": 14.0, "temp_max": 28.0,
+           "hum_sum": 55.0 * 1440, "wind_sum": 8.0 * 1440, "pres_sum": 1010.0 * 1440}
+    assert 4 < agro.et0(day) < 6.5
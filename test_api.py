@@ -0,0 +1,418 @@
+import sqlite3
+import json
+import time
+import calendar
+import datetime
+from datetime import timedelta
+import pytest
+import app
+import rollups
+import setup_db
+import wind
+import writer
+import uploader
+
+NOW = datetime.datetime(2026, 5, 1, 12, 0)  # UTC, hour aligned, so rollup windows match raw ones exactly
+NOW_TS = calendar.timegm(NOW.timetuple())
+
+# the pre-rollup api_v2 queries, kept here as the reference semantics
+OLD_CHART = """
+    SELECT strftime('{fmt}', timestamp) as label,
+           SUM(rain_mm) as rain, AVG(temp_c) as temp, AVG(humidity) as hum,
+           AVG(pressure_hpa) as pres, AVG(wind_speed_kph) as wind, MAX(wind_speed_kph) as gust
+    FROM weather_data WHERE timestamp >= ? {grp} ORDER BY timestamp ASC
+"""
+OLD_RAW_CHART = """
+    SELECT strftime('%H:%M', timestamp) as label,
+           rain_mm as rain, temp_c as temp, humidity as hum,
+           pressure_hpa as pres, wind_speed_kph as wind, wind_speed_kph as gust
+    FROM weather_data WHERE timestamp >= ? ORDER BY timestamp ASC
+"""
+OLD_STATS = """
+    SELECT SUM(rain_mm) as total_rain, AVG(temp_c) as avg_temp, MAX(temp_c) as max_temp, MIN(temp_c) as min_temp,
+           MAX(wind_speed_kph) as max_wind, AVG(wind_speed_kph) as avg_wind,
+           AVG(humidity) as avg_hum, AVG(pressure_hpa) as avg_pres
+    FROM weather_data WHERE timestamp >= ?
+"""
+OLD_PREV = "SELECT AVG(pressure_hpa) as avg_pres FROM weather_data WHERE timestamp >= ? AND timestamp < ?"
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    # labels are local time, the reference queries format UTC text
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(setup_db, "DB_PATH", str(tmp_path / "weather.db"))
+    setup_db.init_db()
+    conn = sqlite3.connect(setup_db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    rows = []
+    for i in range(65 * 144):  # every 10 minutes, 65 days back
+        ts = NOW - timedelta(minutes=10 * i + 3)
+        rows.append((ts.strftime('%Y-%m-%d %H:%M:%S'), calendar.timegm(ts.timetuple()), 10 + (i % 37) * 0.5, 40 + (i % 50),
+                     990 + i * 0.005 + (i % 29) * 0.1, (i % 13) * 1.5, 0.2794 if i % 17 == 0 else 0, 0.4 + (i % 5) * 0.6))
+    conn.executemany("""INSERT INTO weather_data (timestamp, ts, temp_c, humidity, pressure_hpa, wind_speed_kph, rain_mm, wind_dir_voltage)
+                        VALUES (?,?,?,?,?,?,?,?)""", rows)
+    conn.commit()
+    rollups.rebuild(conn)
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("range_arg,days", [("24h", 1), ("7d", 7), ("30d", 30)])
+def test_single_scan_matches_old_queries(conn, range_arg, days):
+    start = NOW - timedelta(days=days)
+    prev_start = start - timedelta(days=days)
+    if range_arg == '24h': q = OLD_RAW_CHART
+    else: q = OLD_CHART.format(fmt="%m-%d %H:00", grp="GROUP BY strftime('%Y-%m-%d %H', timestamp)")
+    old_rows = conn.execute(q, (start,)).fetchall()
+    old_stats = dict(conn.execute(OLD_STATS, (start,)).fetchone())
+    old_prev = conn.execute(OLD_PREV, (prev_start, start)).fetchone()['avg_pres']
+
+    res = app.build_api_v2(conn, range_arg, points=app.CHART_POINTS_MAX, now=NOW_TS)
+
+    chart = res['chart']
+    assert chart['labels'] == [r['label'] for r in old_rows]
+    for key in ('rain', 'temp', 'hum', 'pres', 'wind', 'gust'):
+        assert chart[key] == pytest.approx([r[key] for r in old_rows])
+    for key, val in old_stats.items():
+        assert res['stats'][key] == pytest.approx(val)
+
+    # previous window only shows up through the pressure tendency insight
+    expect = app.generate_objective_insights(res['stats'], {'avg_pres': old_prev}, range_arg, app.agro.totals(conn, NOW_TS))
+    assert res['insights'] == expect
+
+def test_stable_only_when_nothing_else_to_say():
+    calm = {'min_temp': 12.0, 'avg_temp': 15.0, 'total_rain': 10.0, 'avg_hum': 60.0, 'avg_wind': 5.0, 'avg_pres': 1013.0}
+    assert app.generate_objective_insights(calm, {}, '7d') == [("✅", "Conditions are stable.")]
+    season = {'frost_hours': {'today': 1.5}, 'et0': {'today': 1.0}, 'gdd': {'total': 0.0}}
+    assert app.generate_objective_insights(calm, {}, '7d', season) == [("🥶", "1.5 frost hours today.")]
+
+def test_downsample_keeps_totals_and_peaks(conn):
+    full = app.build_api_v2(conn, '30d', points=app.CHART_POINTS_MAX, now=NOW_TS)['chart']
+    small = app.build_api_v2(conn, '30d', points=50, now=NOW_TS)['chart']
+    assert len(full['labels']) == 720 and len(small['labels']) == 50
+    assert sum(small['rain']) == pytest.approx(sum(full['rain']))
+    assert max(small['gust']) == max(full['gust'])
+    assert small['labels'][0] == full['labels'][0]
+
+def test_empty_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(setup_db, "DB_PATH", str(tmp_path / "empty.db"))
+    setup_db.init_db()
+    conn = sqlite3.connect(setup_db.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    for range_arg in ('24h', '7d', '30d'):
+        res = app.build_api_v2(conn, range_arg, now=NOW_TS)
+        assert res['chart']['labels'] == []
+        assert res['stats']['avg_temp'] == 0 and res['stats']['dew_point'] is None
+        assert res['latest_dir'] == "--"
+    conn.close()
+
+def test_windrose_matches_scalar_lookup_and_rollup(conn):
+    rows = [tuple(r) for r in conn.execute("SELECT wind_dir_voltage, wind_speed_kph FROM weather_data")]
+    counts = app.rose_counts(rows)
+    expect = [[0] * len(wind.BANDS) for _ in wind.POINTS]
+    for volts, kph in rows:
+        d = wind.direction_index(volts)
+        if d is not None: expect[d][wind.speed_band(kph)] += 1
+    assert counts.tolist() == expect
+
+    rollup = [[0] * len(wind.BANDS) for _ in wind.POINTS]
+    for d, b, n in conn.execute("SELECT dir, band, SUM(n) FROM weather_rose_daily GROUP BY dir, band"):
+        rollup[d][b] = n
+    assert rollup == expect
+
+    day = app.build_windrose(conn, '24h', now=NOW_TS)
+    assert day['total'] == 144 and len(day['counts']) == 16
+    # 7d/30d are the last 7 and 30 days, not whole days: the first partial day comes from raw rows
+    for range_arg, days in (('7d', 7), ('30d', 30)):
+        rows = conn.execute("SELECT wind_dir_voltage FROM weather_data WHERE ts >= ?", (int(NOW_TS - days * 86400),)).fetchall()
+        assert app.build_windrose(conn, range_arg, now=NOW_TS)['total'] == sum(wind.direction_index(v) is not None for v, in rows)
+
+@pytest.fixture
+def client(conn, monkeypatch):
+    monkeypatch.setattr(app, "DB_PATH", setup_db.DB_PATH)
+    monkeypatch.setattr(app, "db_pool", app.ConnectionPool(1))
+    monkeypatch.setattr(app.time, "time", lambda: NOW_TS)  # range windows end at the fixture data
+    app.api_cache.entries.clear()
+    app.gzip_cache.entries.clear()
+    yield app.app.test_client()
+    app.db_pool.close_all()
+
+def test_conditional_get_and_gzip(conn, client):
+    url = "/api/v2/data?range=30d"
+    plain = client.get(url)
+    zipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["Content-Encoding"] == "gzip" and "Content-Encoding" not in plain.headers
+    assert app.gzip.decompress(zipped.get_data()) == plain.get_data()
+    assert zipped.headers["ETag"] == plain.headers["ETag"]
+
+    etag = plain.headers["ETag"]
+    app.api_cache.entries.clear()  # a 304 must not need the body
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert not app.api_cache.entries
+    assert client.get("/api/v2/data?range=7d", headers={"If-None-Match": etag}).status_code == 200
+
+    conn.execute("INSERT INTO weather_data (ts, temp_c) VALUES (?, 20)", (NOW_TS + 60,))
+    conn.commit()
+    fresh = client.get(url, headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["ETag"] != etag
+
+def test_page_and_static_gzip(client, tmp_path, monkeypatch):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "chart.js").write_text("var chart = 1;\n" * 500)
+    monkeypatch.setattr(app.app, "static_folder", str(static))
+    gz = {"Accept-Encoding": "gzip"}
+
+    page = client.get("/dashboard", headers=gz)
+    assert page.headers["Content-Encoding"] == "gzip" and b"Station Dashboard" in app.gzip.decompress(page.get_data())
+    assert client.get("/", headers={"If-None-Match": page.headers["ETag"]}).status_code == 304
+
+    for _ in range(2):  # second time from the compressed cache
+        js = client.get("/static/chart.js", headers=gz)
+        assert js.headers["Content-Encoding"] == "gzip"
+        assert app.gzip.decompress(js.get_data()) == (static / "chart.js").read_bytes()
+    assert client.get("/static/chart.js", headers={"If-None-Match": js.headers["ETag"], **gz}).status_code == 304
+
+def test_probe_router(client, monkeypatch):
+    monkeypatch.setattr(app, "render_template_string", None)  # nothing may render per request
+    for probe in ("/generate_204", "/hotspot-detect.html", "/connecttest.txt", "/ncsi.txt"):
+        resp = client.get(probe)
+        assert resp.status_code == 302 and resp.headers["Location"] == "/"
+    assert client.get("/favicon.ico").status_code == 404
+    assert client.get("/").get_data() == app.PAGE[0]
+
+def test_hit_log_is_rate_limited(monkeypatch, capsys):
+    clock = [0.0]
+    monkeypatch.setattr(app.time, "monotonic", lambda: clock[0])
+    log = app.HitLog(60)
+    for _ in range(500): log.hit("generate_204")
+    log.hit("page")
+    assert capsys.readouterr().out == ""
+    clock[0] = 61
+    log.hit("page")
+    assert capsys.readouterr().out == "Captive Portal Hits: generate_204 x500, page x2\n"
+
+def test_stream_fans_out_and_resumes(conn, client, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_KEEPALIVE", 0.01)
+    feed = app.Feed(backlog=3)
+    feed.poll()
+    tip = feed.last
+    live = feed.stream()
+    assert next(live) == ": keepalive\n\n"  # nothing new yet
+
+    for i in range(1, 6):
+        conn.execute("INSERT INTO weather_data (ts, temp_c, humidity, wind_speed_kph, gust_kph) VALUES (?, 20, 50, 5, 9)", (NOW_TS + 60 * i,))
+    conn.commit()
+    rollups.update(conn, tip + 1, tip + 5)
+    conn.commit()
+    feed.poll()
+    assert [e[0] for e in feed.events] == [tip + 3, tip + 4, tip + 5] and feed.floor == tip + 2
+
+    got = [next(live) for _ in range(5)]
+    assert [t.split("\n")[0] for t in got] == [f"id: {tip + i}" for i in range(1, 6)]
+    last = app.json.loads(got[-1].split("data: ")[1])
+    assert last["gust"] == 9 and last["today"]["max_gust"] >= 9 and "today" not in app.json.loads(got[0].split("data: ")[1])
+
+    # a reconnecting client older than the in-memory backlog is filled in from the db
+    resumed = feed.stream(since=tip + 1)
+    assert [next(resumed).split("\n")[0] for _ in range(4)] == [f"id: {tip + i}" for i in range(2, 6)]
+    assert app.build_api_v2(conn, '24h', now=NOW_TS)["last_id"] == tip + 5
+
+def test_next_bucket_follows_downsampled_points(conn):
+    # 144 ten-minute rows in 24h merged into 48 points of 30 minutes: the next point starts 30 minutes after the last
+    day = app.build_api_v2(conn, '24h', points=48, now=NOW_TS)
+    assert len(day["chart"]["labels"]) == 48 and day["next_bucket"] == NOW_TS - 3 * 60 - 20 * 60 + 1800
+    # what the page needs to fold streamed readings into its points: their width and sample counts
+    assert day["point_secs"] == 1800 and day["chart"]["n"] == [3] * 48
+
+def test_stream_start_retries_after_failed_first_poll(client, monkeypatch):
+    feed = app.Feed(backlog=3)
+    monkeypatch.setattr(app, "feed", feed)
+    monkeypatch.setattr(app, "STREAM_POLL", 3600)  # keep the watcher thread idle
+    poll = feed.poll
+    def locked(): raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(feed, "poll", locked)
+    assert client.get("/api/v2/stream").status_code == 503 and feed.thread is None
+    monkeypatch.setattr(feed, "poll", poll)
+    feed.start()
+    assert feed.thread.is_alive() and feed.last is not None
+
+def test_stream_clients_wait_for_the_first_poll(client, monkeypatch):
+    import threading
+    feed = app.Feed(backlog=3)
+    monkeypatch.setattr(app, "feed", feed)
+    monkeypatch.setattr(app, "STREAM_POLL", 3600)
+    poll, release, calls = feed.poll, threading.Event(), []
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        if len(calls) == 1: raise sqlite3.OperationalError("database is locked")
+        poll()
+    monkeypatch.setattr(feed, "poll", slow)
+    first, second = threading.Thread(target=lambda: pytest.raises(sqlite3.Error, feed.start)), threading.Thread(target=feed.start)
+    first.start()
+    while not calls: time.sleep(0.01)
+    second.start()
+    time.sleep(0.1)
+    assert second.is_alive()  # the crew's second phone waits instead of streaming from last=None
+    release.set()
+    first.join(5); second.join(5)
+    assert len(calls) == 2 and feed.last is not None and feed.thread.is_alive()  # it retried the failed poll
+    assert next(feed.stream(0)) is not None
+
+@pytest.mark.parametrize("bucket, source", [("1d", "daily"), ("1w", "daily"), ("3h", "hourly"), ("30m", "10min"), ("5m", "raw")])
+def test_window_planner_matches_raw_rows(conn, bucket, source):
+    start, end = NOW_TS - 20 * 86400 - 1234, NOW_TS - 17 * 86400
+    res = app.build_window(conn, start, end, app.parse_bucket(bucket), points=2000)
+    assert res["window"]["source"] == source
+    secs = res["window"]["bucket"]
+    lo = calendar.timegm(time.strptime(res["window"]["start"], "%Y-%m-%dT%H:%M:%S"))  # TZ is UTC here
+    hi = calendar.timegm(time.strptime(res["window"]["end"], "%Y-%m-%dT%H:%M:%S"))
+    assert lo <= start and hi >= end and lo % min(secs, 86400) == 0  # weeks start on the first local day
+    expect = {}
+    for ts, rain, temp in conn.execute("SELECT ts, rain_mm, temp_c FROM weather_data WHERE ts >= ? AND ts < ?", (lo, hi)):
+        expect.setdefault((ts - lo) // secs, []).append((rain, temp))
+    chart = res["chart"]
+    assert len(chart["labels"]) == len(expect)
+    for i, k in enumerate(sorted(expect)):
+        rows = expect[k]
+        assert chart["rain"][i] == pytest.approx(sum(r for r, _ in rows))
+        assert chart["temp"][i] == pytest.approx(sum(t for _, t in rows) / len(rows))
+
+def test_window_caps_points_and_reads_compacted_tier(conn):
+    import compact
+    before = app.build_window(conn, NOW_TS - 60 * 86400, NOW_TS, 300, points=300)
+    assert before["window"]["bucket"] == 6 * 3600 and len(before["chart"]["labels"]) <= 300
+    old = app.build_window(conn, NOW_TS - 60 * 86400, NOW_TS - 50 * 86400, 1800, points=2000)
+    compact.expire_raw(conn, NOW_TS - 30 * 86400, pause=0)
+    assert conn.execute("SELECT MIN(ts) FROM weather_data").fetchone()[0] >= NOW_TS - 30 * 86400
+    assert app.build_window(conn, NOW_TS - 60 * 86400, NOW_TS - 50 * 86400, 1800, points=2000) == old
+
+def test_window_caps_points_past_the_bucket_ladder():
+    for points in (10, 23, 60):
+        _, start, end, bucket, _ = app.plan_window(NOW_TS - 5 * 365 * 86400, NOW_TS, 3600, points)
+        assert bucket % app.BUCKET_LADDER[-1] == 0 and -(-(end - start) // bucket) <= points
+
+def test_window_caps_points_after_snapping():
+    # the window fits 576 three-hour buckets, its snapped edges need 577
+    _, start, end, bucket, _ = app.plan_window(1728458409, 1753339357, 3 * 3600, 576)
+    assert (end - start) // bucket <= 576
+    import random
+    rng = random.Random(7)
+    for _ in range(500):
+        start = rng.randrange(1_600_000_000, 1_800_000_000)
+        want = rng.choice([60, 300, 3600, 3 * 3600, 86400])
+        points = rng.randrange(10, 2000)
+        _, lo, hi, bucket, _ = app.plan_window(start, start + rng.randrange(3600, 3 * 365 * 86400), want, points)
+        assert -(-(hi - lo) // bucket) <= points
+
+def test_window_route(client):
+    ok = client.get(f"/api/v2/data?start=2026-04-01&end=2026-04-10&bucket=1d")
+    assert ok.status_code == 200 and ok.json["window"] == {"start": "2026-04-01T00:00:00", "end": "2026-04-11T00:00:00",
+                                                           "bucket": 86400, "source": "daily"}
+    assert len(ok.json["chart"]["labels"]) == 10
+    for bad in ("bucket=7m", "bucket=5x", "bucket=36h", f"start={NOW_TS}&end={NOW_TS - 60}"):
+        assert client.get(f"/api/v2/data?{bad}").status_code == 400
+
+def test_metrics_endpoint(client, tmp_path, monkeypatch):
+    import metrics
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    monkeypatch.setattr(app, "SQL_HISTS", {})
+    monkeypatch.setattr(app, "ROUTE_METRICS", {})
+    logger_reg = metrics.Registry()
+    logger_reg.counter("logger_cycles_total", "Rows logged").inc(7)
+    logger_reg.write(str(tmp_path / "logger_metrics.json"))
+    monkeypatch.setattr(app, "LOGGER_METRICS_PATH", str(tmp_path / "logger_metrics.json"))
+    client.get("/api/v2/data?range=24h")
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'http_request_seconds_count{route="/api/v2/data"} 1' in text
+    assert 'http_responses_total{route="/api/v2/data",status="200"} 1' in text
+    assert 'db_query_seconds_count{sql="SELECT id, ts FROM weather_data ORDER BY id DESC LIMIT 1"}' in text
+    assert "logger_cycles_total 7" in text
+
+def test_agro_endpoint(client):
+    res = client.get("/api/v2/agro").json
+    assert set(res) >= {"gdd", "chill_hours", "frost_hours", "et0"} and res["gdd"]["season_start"] == "2026-01-01"
+    assert res["gdd"]["total"] > 0 and res["et0"]["unit"] == "mm"
+
+def test_ingest_is_idempotent_and_per_station(conn, client, monkeypatch):
+    rows = [[NOW_TS - 60 * i, 20.0, 50.0, 1000.0, 5.0, 0.2794, 1.2, 9.0, 0.0] for i in range(1, 121)]
+    body = app.gzip.compress(json.dumps({"station": "pond", "seq": 7, "rows": rows}).encode())
+    post = lambda data, **h: client.post("/api/v2/ingest", data=data, headers={"Authorization": "Bearer s3cret", **h})
+    local = client.get("/api/v2/data?range=24h").json["stats"]
+    # off until the hub sets a token: the portal Wi-Fi is open to anyone
+    assert post(body, **{"Content-Encoding": "gzip"}).status_code == 404
+    monkeypatch.setattr(app, "INGEST_TOKEN", "s3cret")
+
+    assert post(body, **{"Content-Encoding": "gzip"}).json == {"status": "ok", "rows": 120, "seq": 7}
+    # a resend after a lost reply is acknowledged, not stored twice
+    assert post(body, **{"Content-Encoding": "gzip"}).json == {"status": "duplicate", "rows": 0, "seq": 7}
+    assert client.get("/api/v2/ingest?station=pond", headers={"Authorization": "Bearer s3cret"}).json["seq"] == 7
+    assert conn.execute("SELECT SUM(n) FROM weather_hourly WHERE station_id = 'pond'").fetchone()[0] == 120
+
+    pond = client.get("/api/v2/data?range=24h&station=pond").json["stats"]
+    assert pond["avg_temp"] == 20.0 and pond["max_gust"] == 9.0 and abs(pond["total_rain"] - 120 * 0.2794) < 1e-9
+    assert client.get("/api/v2/data?range=24h").json["stats"] == local
+    assert {s["station"] for s in client.get("/api/v2/stations").json["stations"]} == {"local", "pond"}
+    csv = client.get("/export?format=csv&station=pond&columns=ts,temp_c,station_id").get_data(as_text=True).split()
+    assert len(csv) == 121 and csv[1].endswith(",20.0,pond")
+    gusts = client.get("/export?format=csv&station=pond&columns=ts,gust_kph,rain_rate_mmh").get_data(as_text=True).split()
+    assert gusts[0] == "ts,gust_kph,rain_rate_mmh" and gusts[1].split(",")[1] == "9.0"
+
+    for bad in ({"station": "local", "seq": 1, "rows": rows}, {"station": "pond", "seq": 0, "rows": rows},
+                {"station": "pond", "seq": 8, "rows": [["noon", 20]]}):
+        assert post(json.dumps(bad)).status_code == 400
+    assert post(b"not gzip", **{"Content-Encoding": "gzip"}).status_code == 400
+    assert post(body, **{"Content-Encoding": "gzip", "Authorization": "Bearer guess"}).status_code == 401
+    assert client.get("/api/v2/ingest?station=pond").status_code == 401
+
+def test_uploader_resumes_from_hub_seq(client, tmp_path, monkeypatch):
+    remote = str(tmp_path / "remote.db")
+    monkeypatch.setattr(setup_db, "DB_PATH", remote)
+    setup_db.init_db()
+    rc = sqlite3.connect(remote)
+    writer.insert_rows(rc, [(NOW_TS - 60 * i, 15.0) + (None,) * 7 for i in range(50, 0, -1)])
+    rc.commit()
+
+    def request(self, body=None):  # the hub is the test client instead of a socket
+        if body is None: return client.get(f"/api/v2/ingest?station={self.station}", headers=self.headers).json
+        return client.post("/api/v2/ingest", data=body, headers={**self.headers, "Content-Encoding": "gzip"}).json
+    monkeypatch.setattr(uploader.Uploader, "request", request)
+    monkeypatch.setattr(app, "INGEST_TOKEN", "s3cret")
+    up = uploader.Uploader("http://hub", "field", remote, token="s3cret", batch=20)
+    assert [up.send(rc) for _ in range(4)] == [20, 20, 10, 0]
+
+    writer.insert_rows(rc, [(NOW_TS + 60, 16.0) + (None,) * 7])
+    rc.commit()
+    restarted = uploader.Uploader("http://hub", "field", remote, token="s3cret", batch=20)
+    assert restarted.send(rc) == 1 and restarted.cursor == 51
+    hub = sqlite3.connect(app.DB_PATH)
+    assert hub.execute("SELECT COUNT(*), MAX(ts) FROM weather_data WHERE station_id = 'field'").fetchone() == (51, NOW_TS + 60)
+
+def test_current_served_from_logger_snapshot(conn, client, tmp_path, monkeypatch):
+    import current
+    live = current.Publisher(str(tmp_path / "current"))
+    live.seed(conn)
+    live.publish({"bme280": True, "ads1015": True})  # written at NOW_TS, time.time is patched
+    monkeypatch.setattr(app, "live", current.Reader(str(tmp_path / "current")))
+    day = client.get("/api/v2/data?range=24h").json
+
+    get_db = app.get_db
+    def no_db(): raise AssertionError("current conditions touched the db")
+    monkeypatch.setattr(app, "get_db", no_db)
+    cur = client.get("/api/v2/current").json
+    assert cur["source"] == "logger" and cur["health"]["bme280"] and cur["latest_dir"] == day["latest_dir"]
+    assert cur["stats"] == day["stats"] and cur["wind_ok"] == day["wind_ok"]
+    assert cur["reading"]["ts"] == NOW_TS - 180
+
+    # logger stopped: the newest row from the db instead
+    monkeypatch.setattr(app, "get_db", get_db)
+    monkeypatch.setattr(app.time, "time", lambda: NOW_TS + current.STALE)
+    cur = client.get("/api/v2/current").json
+    assert cur["source"] == "db" and cur["health"] is None and cur["reading"]["ts"] == NOW_TS - 180
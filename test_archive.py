@@ -0,0 +1,90 @@
+import sqlite3
+import numpy as np
+import pytest
+import app
+import archive
+import compact
+import rollups
+
+NOW = 1780000000
+
+@pytest.fixture
+def db(db):
+    conn = sqlite3.connect(db)
+    rows = [(NOW - 300 * i, None if i % 97 == 0 else 10 + i % 7, 50, 1000, i % 11, 0.2794 if i % 13 == 0 else 0, 1.2)
+            for i in range(200 * 288)]  # 5-minute rows, 200 days back, a few missing temperatures
+    conn.executemany("""INSERT INTO weather_data (ts, temp_c, humidity, pressure_hpa, wind_speed_kph, rain_mm, wind_dir_voltage)
+                        VALUES (?,?,?,?,?,?,?)""", rows[::-1])
+    conn.execute("UPDATE weather_data SET timestamp = datetime(ts, 'unixepoch')")
+    conn.commit()
+    rollups.rebuild(conn)
+    conn.close()
+    return db
+
+def test_completed_months_with_stats(db, tmp_path):
+    root = str(tmp_path / "archive")
+    conn = sqlite3.connect(db)
+    done = archive.archive(conn, root, now=NOW)
+    assert len(done) == 6 and archive.archive(conn, root, now=NOW) == {}  # 200 days back from late May: Nov..Apr
+    parts = archive.Archive(root).partitions()
+    assert [(p[1]["year"], p[1]["month"]) for p in parts] == list(done)
+    for path, meta in parts:
+        n, lo, hi, nulls = conn.execute("""SELECT COUNT(*), MIN(temp_c), MAX(temp_c), SUM(temp_c IS NULL)
+                                           FROM weather_data WHERE ts >= ? AND ts < ?""", (meta["start"], meta["end"])).fetchone()
+        assert meta["rows"] == n and meta["columns"]["temp_c"] == {"min": lo, "max": hi, "nulls": nulls}
+    # the current month is not complete yet
+    assert parts[-1][1]["end"] <= NOW < parts[-1][1]["end"] + 31 * 86400
+
+    # only overlapping partitions are opened, and the columns come back memory-mapped
+    mid = parts[2][1]["start"] + 86400
+    got = list(archive.Archive(root).read(["ts", "rain_mm"], mid, mid + 3600))
+    assert len(got) == 1 and isinstance(got[0]["rain_mm"], np.memmap)
+    expect = conn.execute("SELECT ts, rain_mm FROM weather_data WHERE ts >= ? AND ts < ? ORDER BY ts", (mid, mid + 3600)).fetchall()
+    assert list(zip(got[0]["ts"].tolist(), got[0]["rain_mm"].tolist())) == expect
+    conn.close()
+
+def test_export_reads_archive_after_compaction(db, tmp_path, monkeypatch):
+    root = str(tmp_path / "archive")
+    monkeypatch.setattr(app, "history", archive.Archive(root))
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE weather_data SET station_id = 'pond' WHERE id % 5 = 0")  # an ingested station
+    conn.commit()
+    cols = app.EXPORT_COLUMNS
+    before = list(app.export_rows(conn, cols, None, None))
+    window = list(app.export_rows(conn, cols, NOW - 150 * 86400, NOW - 20 * 86400))
+    pond = list(app.export_rows(conn, cols, None, None, "pond"))
+
+    r = compact.compact(db, raw_days=90, ten_min_days=730, pause=0, now=NOW, archive_dir=root)
+    assert r["months_archived"] == 6 and r["raw_rows_moved"] > 0
+    assert list(app.export_rows(conn, cols, None, None)) == before
+    assert list(app.export_rows(conn, cols, NOW - 150 * 86400, NOW - 20 * 86400)) == window
+    assert list(app.export_rows(conn, cols, None, None, "pond")) == pond and len(pond) == len(before) // 5
+
+    # station_id is stored as 2-byte codes into _meta.json; months archived as names still read
+    path, meta = app.history.partitions()[0]
+    codes = np.load(path + "/station_id.npy")
+    assert codes.dtype == np.uint16 and meta["columns"]["station_id"]["values"] == ["local", "pond"]
+    np.save(path + "/station_id.npy", np.array(meta["columns"]["station_id"]["values"])[codes])
+    assert list(app.export_rows(conn, cols, None, None, "pond")) == pond
+    conn.close()
+
+def test_late_rows_reach_export_and_archive(db, tmp_path, monkeypatch):
+    root = str(tmp_path / "archive")
+    monkeypatch.setattr(app, "history", archive.Archive(root))
+    compact.compact(db, raw_days=90, ten_min_days=730, pause=0, now=NOW, archive_dir=root)
+    conn = sqlite3.connect(db)
+    cols = ["ts", "temp_c", "timestamp"]
+    before = list(app.export_rows(conn, cols, None, None))
+    # a journal replay or uploader backlog for a month that is archived and compacted, timestamp left NULL
+    late = NOW - 150 * 86400 + 150
+    conn.execute("INSERT INTO weather_data (ts, temp_c, timestamp) VALUES (?, 99, NULL)", (late,))
+    conn.commit()
+    got = list(app.export_rows(conn, cols, None, None))
+    assert len(got) == len(before) + 1 and [r[0] for r in got] == sorted(r[0] for r in got)
+    assert (late, 99.0) in [r[:2] for r in got]
+
+    r = compact.compact(db, raw_days=90, ten_min_days=730, pause=0, now=NOW, archive_dir=root)
+    assert r["months_archived"] == 1
+    assert conn.execute("SELECT COUNT(*) FROM weather_data WHERE ts = ?", (late,)).fetchone()[0] == 0  # only in the archive now
+    assert list(app.export_rows(conn, cols, None, None)) == got
+    conn.close()
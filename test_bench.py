@@ -0,0 +1,42 @@
+import json
+import time
+import sqlite3
+import app
+import setup_db
+from bench import run, synth, startup
+
+def test_synthetic_db_and_runner(tmp_path):
+    path = str(tmp_path / "bench.db")
+    before = setup_db.DB_PATH, app.DB_PATH, app.db_pool, app.api_cache
+    synth.build(path, 3, int(time.time()))
+    conn = sqlite3.connect(path)
+    n = conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0]
+    assert n == 3 * 1440 and conn.execute("SELECT SUM(n) FROM weather_hourly").fetchone()[0] == n
+    conn.close()
+
+    routes = run.bench_routes(path, 2)
+    assert all(routes[url]["status"] == 200 for url in run.ROUTES)
+    assert routes["/api/v2/data?range=24h"]["cached"]["n"] == 2
+    assert (setup_db.DB_PATH, app.DB_PATH, app.db_pool, app.api_cache) == before  # nothing leaks into later tests
+
+    inserts = run.bench_inserts(path, 30, 5)
+    assert inserts["rows_per_s"] > 0
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0] == n + 30
+    conn.close()
+
+def test_steps_run_in_their_own_interpreters(tmp_path):
+    # so each step's peak RSS is its own and not the data generator's
+    path = str(tmp_path / "child.db")
+    run.in_child("bench.synth", path, 2, int(time.time()))
+    inserts = json.loads(run.in_child("bench.run", "--measure", "inserts", "--db", path, "--insert-rows", 10))
+    assert inserts["rows"] == 10 and 0 < inserts["peak_rss_mb"]
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0] == 2 * 1440 + 10
+    conn.close()
+
+def test_startup_leaves_heavy_imports_lazy():
+    report = startup.measure(runs=1)
+    assert report["status"] == 200 and report["idle_rss_mb"] > 0 and report["import_s"] > 0
+    assert report["heavy_loaded"] == []
+    assert report["slowest_imports"] and report["importtime_total_ms"] > 0
@@ -0,0 +1,61 @@
+import sqlite3
+import pytest
+import compact
+import rollups
+
+NOW = 1780000000
+
+@pytest.fixture
+def db(db):
+    conn = sqlite3.connect(db)
+    rows = [(NOW - 300 * i, 10 + i % 7, 50, 1000, i % 11, 0.2794 if i % 13 == 0 else 0, 1.2)
+            for i in range(200 * 288)]  # 5-minute rows, 200 days back
+    conn.executemany("""INSERT INTO weather_data (ts, temp_c, humidity, pressure_hpa, wind_speed_kph, rain_mm, wind_dir_voltage)
+                        VALUES (?,?,?,?,?,?,?)""", rows[::-1])
+    conn.commit()
+    rollups.rebuild(conn)
+    conn.close()
+    return db
+
+def totals(conn, table):
+    return conn.execute(f"SELECT SUM(n), ROUND(SUM(rain_sum), 6), MAX(temp_max) FROM {table}").fetchone()
+
+def test_tiers_and_space(db):
+    conn = sqlite3.connect(db)
+    hourly = totals(conn, "weather_hourly")
+    daily = totals(conn, "weather_daily")
+    rose = conn.execute("SELECT SUM(n) FROM weather_rose_daily").fetchone()
+    conn.close()
+
+    r = compact.compact(db, raw_days=90, ten_min_days=150, batch=5000, pause=0, now=NOW)
+    assert r["raw_rows_moved"] > 0 and r["ten_min_rows_dropped"] > 0
+    assert r["incremental_vacuum"] and r["size_after"] < r["size_before"]
+
+    conn = sqlite3.connect(db)
+    oldest = conn.execute("SELECT MIN(ts) FROM weather_data").fetchone()[0]
+    assert oldest >= compact.local_midnight(NOW - 90 * 86400)
+    raw = conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0]
+    ten = conn.execute("SELECT SUM(n), MIN(bucket) FROM weather_10min").fetchone()
+    assert raw + ten[0] + r["ten_min_rows_dropped"] * 2 == 200 * 288  # two 5-minute rows per 10-minute bucket
+    assert ten[1] * 600 >= compact.local_midnight(NOW - 150 * 86400)
+    # the long-range tiers are untouched, and a rollup rebuild keeps the compacted history
+    assert totals(conn, "weather_hourly") == hourly
+    rollups.rebuild(conn)
+    assert totals(conn, "weather_hourly") == hourly
+    assert totals(conn, "weather_daily") == daily
+    assert conn.execute("SELECT SUM(n) FROM weather_rose_daily").fetchone() == rose
+    conn.close()
+
+def test_rebuild_keeps_history_with_no_raw_rows_left(db):
+    # the logger has been off for longer than raw retention: every row is compacted
+    compact.compact(db, raw_days=1, ten_min_days=730, pause=0, now=NOW + 30 * 86400)
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0] == 0
+    daily = totals(conn, "weather_daily")
+    rollups.rebuild(conn)
+    assert totals(conn, "weather_daily") == daily and daily[0] == 200 * 288
+    conn.close()
+
+def test_noop_when_nothing_expired(db):
+    r = compact.compact(db, raw_days=365, ten_min_days=730, pause=0, now=NOW)
+    assert r["raw_rows_moved"] == 0 and r["ten_min_rows_dropped"] == 0
@@ -0,0 +1,60 @@
+import sqlite3
+import current
+import logger
+from writer import Writer
+from sensors import SimulatedSensors
+
+def test_logger_publishes_current_conditions(db, tmp_path):
+    path = str(tmp_path / "current")
+    live = current.Publisher(path)
+    w = Writer(db, db + ".journal", batch_size=50)
+    assert logger.run(SimulatedSensors(speed=0, start=1_700_000_000, seed=5), w, rows=1500, live=live) == 1500
+
+    snap = current.Reader(path).read()
+    conn = sqlite3.connect(db)
+    newest = conn.execute("SELECT * FROM (SELECT ts, temp_c, wind_dir_voltage FROM weather_data ORDER BY ts DESC LIMIT 1)").fetchone()
+    assert (snap["reading"]["ts"], snap["reading"]["temp_c"], snap["reading"]["wind_dir_voltage"]) == newest
+    assert snap["health"] == {"bme280": True, "ads1015": True} and snap["last_read"] is not None
+    # only the last 24h count
+    n, rain, hi = conn.execute("SELECT COUNT(*), SUM(rain_mm), MAX(temp_c) FROM weather_data WHERE ts > ?", (newest[0] - 86400,)).fetchone()
+    assert snap["stats"]["n"] == n == 1440 and abs(snap["stats"]["total_rain"] - rain) < 1e-9 and snap["stats"]["max_temp"] == hi
+
+    # a restarted logger picks the window back up from the db
+    again = current.Publisher(str(tmp_path / "again"))
+    again.seed(conn)
+    again.publish({})
+    assert current.Reader(str(tmp_path / "again")).read()["stats"] == snap["stats"]
+    conn.close()
+    w.close()
+
+def test_snapshot_is_never_a_batch_behind(db, tmp_path):
+    # the default batch commits every 5 readings; the snapshot still shows each one as it is read
+    path = str(tmp_path / "current")
+    reader, ages = current.Reader(path), []
+    class Watched(current.Publisher):
+        def publish(self, health):
+            super().publish(health)
+            ages.append(backend.clock() - reader.read()["reading"]["ts"])
+    backend = SimulatedSensors(speed=0, start=1_700_000_000, seed=5)
+    w = Writer(db, db + ".journal", batch_size=logger.BATCH_SIZE)
+    assert logger.run(backend, w, rows=4 * logger.BATCH_SIZE + 2, live=Watched(path)) == 22
+    w.close()
+    # the dashboard's SYS dot goes red past 3 logging intervals
+    assert ages == [0] * 22 and max(ages) < 3 * logger.LOG_INTERVAL
+
+def test_reader_skips_torn_and_stale_snapshots(tmp_path):
+    path = str(tmp_path / "current")
+    live = current.Publisher(path)
+    reader = current.Reader(path)
+    assert reader.read() is None  # created, nothing published yet
+    live.add((1_700_000_000, 12.5, 60.0, None, 3.0, 0.0, 1.2, 7.0, 0.0))
+    live.publish({"bme280": True, "ads1015": False})
+    snap = reader.read()
+    assert snap["reading"]["pressure_hpa"] is None and snap["health"] == {"bme280": True, "ads1015": False}
+    assert snap["stats"]["max_gust"] == 7.0 and snap["stats"]["avg_pres"] == 0  # as app.Agg: sum of nothing over n
+
+    current.SEQ.pack_into(live.buf, 4, live.seq + 1)  # the logger died mid-write
+    assert reader.read() is None
+    live.publish({})
+    assert reader.read(now=snap["written"] + current.STALE + 60) is None  # logger stopped publishing
+    live.close()
@@ -5,6 +5,7 @@ from gpiozero import Button
 from adafruit_bme280 import basic as adafruit_bme280
 from adafruit_ads1x15.ads1015 import ADS1015
 from adafruit_ads1x15.analog_in import AnalogIn
+import wind
 
 # config
 PIN_WIND = 5
@@ -55,11 +56,10 @@ if wind_sensor: wind_sensor.when_pressed = wind_callback
 if rain_sensor: rain_sensor.when_pressed = rain_callback
 
 # --- VOLTAGE MAPPER (For visual testing) ---
+# shared table in wind.py; note the volts shown for uncalibrated "?" positions
 def get_cardinal(volts):
     if volts < 0.1: return "Err"
-    map = {0.4:"W", 0.9:"NW", 1.2:"N", 1.4:"SW", 1.8:"NE", 2.0:"S", 2.2:"SE", 2.8:"E"}
-    closest = min(map.keys(), key=lambda k: abs(k-volts))
-    return map[closest] if abs(closest - volts) < 0.3 else "?"
+    return wind.cardinal(volts)
 
 print("\n" + "="*60)
 print("TESTING LIVE SENSORS")
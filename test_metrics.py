@@ -0,0 +1,45 @@
+import metrics
+import logger
+from writer import Writer
+
+def test_histogram_render_and_snapshot_round_trip(tmp_path):
+    reg = metrics.Registry()
+    h = reg.histogram("req_seconds", "Request time", (0.1, 1), route="/a")
+    for v in (0.05, 0.1, 0.5, 3): h.observe(v)
+    reg.counter("hits_total", "Hits", path='x"y').inc(2)
+    text = metrics.render(reg.snapshot())
+    assert 'req_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'req_seconds_bucket{route="/a",le="1"} 3' in text
+    assert 'req_seconds_bucket{route="/a",le="+Inf"} 4' in text
+    assert 'req_seconds_count{route="/a"} 4' in text and 'req_seconds_sum{route="/a"} 3.65' in text
+    assert 'hits_total{path="x\\"y"} 2' in text and text.count("# TYPE hits_total counter") == 1
+
+    path = str(tmp_path / "m.json")
+    reg.write(path)
+    assert metrics.render(metrics.read_snapshot(path)) == text
+    assert metrics.read_snapshot(str(tmp_path / "missing.json")) == []
+
+class Flaky:
+    """Backend whose second read fails."""
+    speed = 0
+    def __init__(self): self.n = 0
+    def start(self, wind_ticks, rain_ticks): pass
+    def wait(self, seconds):
+        self.n += 1
+        return seconds if self.n <= 3 else 0
+    def read(self):
+        if self.n == 2: raise OSError("i2c timeout")
+        return 20.0, 50.0, 1010.0, 1.2
+    def clock(self): return 1000 + 60 * self.n
+
+def test_logger_counts_failed_cycles(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "REGISTRY", metrics.Registry())
+    import setup_db
+    monkeypatch.setattr(setup_db, "DB_PATH", str(tmp_path / "weather.db"))
+    setup_db.init_db()
+    w = Writer(setup_db.DB_PATH, setup_db.DB_PATH + ".journal", batch_size=1)
+    assert logger.run(Flaky(), w) == 2
+    w.close()
+    snap = {m["name"]: m for m in metrics.REGISTRY.snapshot()}
+    assert snap["logger_cycles_total"]["value"] == 2 and snap["logger_cycles_failed_total"]["value"] == 1
+    assert sum(snap["writer_commit_seconds"]["counts"]) == 2
@@ -0,0 +1,95 @@
+import csv
+import sqlite3
+import pytest
+import setup_db
+import logger
+from writer import Writer
+from sensors import SimulatedSensors, ReplaySensors
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    out = conn.execute("SELECT ts, temp_c, wind_speed_kph, rain_mm, gust_kph, wind_dir_voltage FROM weather_data ORDER BY ts").fetchall()
+    conn.close()
+    return out
+
+def test_simulated_day(db):
+    w = Writer(db, db + ".journal", batch_size=50)
+    assert logger.run(SimulatedSensors(speed=0, start=1_700_000_000, seed=4), w, rows=1440) == 1440  # a day with a shower
+    w.close()
+    got = rows(db)
+    assert len(got) == 1440
+    assert [r[0] for r in got] == list(range(1_700_000_060, 1_700_000_060 + 1440 * 60, 60))
+    assert all(r[4] >= r[2] for r in got)  # 3 s gust never below the minute mean
+    assert all(-20 < r[1] < 40 and r[5] > 0 for r in got)
+    # rain rate is the peak from tip spacing: zero without tips, never below what the tips imply
+    conn = sqlite3.connect(db)
+    rain = conn.execute("SELECT rain_mm, rain_rate_mmh FROM weather_data").fetchall()
+    conn.close()
+    assert any(mm for mm, _ in rain)
+    assert all(rate == 0 if not mm else rate >= (round(mm / 0.2794) - 1) * 0.2794 * 60 - 0.01 for mm, rate in rain)
+
+def test_replay_round_trip(db, tmp_path):
+    src = tmp_path / "export.csv"
+    with open(src, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(["ts", "temp_c", "humidity", "pressure_hpa", "wind_speed_kph", "rain_mm", "wind_dir_voltage", "gust_kph"])
+        out.writerow([1000, 21.5, 40, 1012, 12.0, 0.0, 2.5, 24.0])
+        out.writerow([1060, 21.0, 42, 1012, 4.8, 0.56, 0.4, ""])
+    w = Writer(db, db + ".journal")
+    assert logger.run(ReplaySensors(str(src)), w) == 2
+    w.close()
+    # speeds, gusts and rain come back through the tick rings unchanged
+    assert rows(db) == [(1000, 21.5, 12.0, 0.0, 24.0, 2.5), (1060, 21.0, 4.8, 0.56, 4.8, 0.4)]
+    conn = sqlite3.connect(db)
+    assert [r[0] for r in conn.execute("SELECT rain_rate_mmh FROM weather_data ORDER BY ts")] == [0.0, 33.53]
+    conn.close()
+
+    # a logged db replays into another one
+    other = str(tmp_path / "copy.db")
+    conn = sqlite3.connect(other); conn.close()
+    setup_db.DB_PATH = other
+    setup_db.init_db()
+    w = Writer(other, other + ".journal")
+    logger.run(ReplaySensors(db), w)
+    w.close()
+    assert rows(other) == rows(db)
+
+class FakeClock:
+    def __init__(self, t): self.wall, self.mono, self.sleeps = t, 1000.0, []
+    def time(self): return self.wall
+    def monotonic(self): return self.mono
+    def sleep(self, s):
+        self.sleeps.append(s)
+        self.advance(s + 0.002)  # the kernel wakes us a little late
+    def advance(self, s): self.wall += s; self.mono += s
+
+def test_hardware_wait_is_aligned_and_drift_free(monkeypatch):
+    from sensors import HardwareSensors
+    clock = FakeClock(1_700_000_017.5)
+    for name in ("time", "monotonic", "sleep"): monkeypatch.setattr(f"sensors.time.{name}", getattr(clock, name))
+    hw = HardwareSensors.__new__(HardwareSensors)  # no GPIO/I2C here
+    hw.boundary, hw.stamp = clock.monotonic(), int(clock.time())
+    first = hw.wait(60)
+    assert hw.clock() == 1_700_000_040 and first == pytest.approx(22.502)
+    for i in range(1, 4):
+        clock.advance(0.8)  # sensor reads and the db write
+        clock.sleeps.clear()
+        assert hw.wait(60) == pytest.approx(60, abs=0.01)
+        assert len(clock.sleeps) == 1  # one wakeup per interval
+        assert hw.clock() == 1_700_000_040 + 60 * i  # still on the minute after the slow cycles
+
+class Boundary(SimulatedSensors):
+    """Ticks that land while the row is being read belong to the next interval."""
+    def read(self):
+        self.wind_ticks.tick_at(self.t + 0.5)
+        return 20.0, 50.0, 1010.0, 1.2
+
+def test_ticks_after_boundary_count_next_interval(db):
+    sim = Boundary(speed=0, start=1_700_000_000, seed=1)
+    sim.kph = 0
+    sim.wait = lambda seconds: (setattr(sim, "t", sim.t + seconds), seconds)[1]  # no modelled wind
+    w = Writer(db, db + ".journal", batch_size=1)
+    logger.run(sim, w, rows=3)
+    w.close()
+    speeds = [r[2] for r in rows(db)]
+    assert speeds == [0, round(1 / 60 * 2.4, 2), round(1 / 60 * 2.4, 2)]
@@ -0,0 +1,86 @@
+import sqlite3
+import calendar
+import datetime
+import setup_db
+
+def test_migrates_legacy_database(tmp_path, monkeypatch):
+    # a pre-versioning database: text timestamps only, user_version 0
+    monkeypatch.setattr(setup_db, "DB_PATH", str(tmp_path / "weather.db"))
+    monkeypatch.setattr(setup_db, "BATCH", 7)
+    conn = sqlite3.connect(setup_db.DB_PATH)
+    conn.execute('''CREATE TABLE weather_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        temp_c REAL, humidity REAL, pressure_hpa REAL, wind_speed_kph REAL,
+        rain_mm REAL, wind_dir_voltage REAL)''')
+    conn.execute('CREATE INDEX idx_timestamp ON weather_data (timestamp)')
+    base = datetime.datetime(2026, 1, 1)
+    stamps = [base + datetime.timedelta(minutes=17 * i) for i in range(50)]
+    conn.executemany("INSERT INTO weather_data (timestamp, temp_c, rain_mm) VALUES (?, ?, 0.2794)",
+                     [(t.strftime('%Y-%m-%d %H:%M:%S'), i) for i, t in enumerate(stamps)])
+    conn.commit(); conn.close()
+
+    setup_db.init_db()
+    setup_db.init_db()  # re-running is a no-op
+
+    conn = sqlite3.connect(setup_db.DB_PATH)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(setup_db.MIGRATIONS)
+    ts = [r[0] for r in conn.execute("SELECT ts FROM weather_data ORDER BY id")]
+    assert ts == [calendar.timegm(t.timetuple()) for t in stamps]
+    indexes = {r[1] for r in conn.execute("PRAGMA index_list(weather_data)")}
+    assert 'idx_ts' in indexes and 'idx_timestamp' not in indexes
+    n, rain = conn.execute("SELECT SUM(n), SUM(rain_sum) FROM weather_hourly").fetchone()
+    assert n == 50 and abs(rain - 50 * 0.2794) < 1e-9
+    assert conn.execute("SELECT SUM(n) FROM weather_daily").fetchone()[0] == 50
+    conn.close()
+
+def test_station_id_keeps_compacted_rollups(tmp_path, monkeypatch):
+    # a v6 database whose hourly rollup holds history compact.py already deleted the raw rows of
+    monkeypatch.setattr(setup_db, "DB_PATH", str(tmp_path / "weather.db"))
+    conn = sqlite3.connect(setup_db.DB_PATH)
+    conn.execute('''CREATE TABLE weather_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        temp_c REAL, humidity REAL, pressure_hpa REAL, wind_speed_kph REAL,
+        rain_mm REAL, wind_dir_voltage REAL, ts INTEGER, gust_kph REAL, rain_rate_mmh REAL)''')
+    conn.execute("CREATE TABLE weather_hourly (bucket INTEGER PRIMARY KEY, n INTEGER NOT NULL, rain_sum REAL) WITHOUT ROWID")
+    conn.execute("INSERT INTO weather_hourly VALUES (400000, 60, 1.5)")
+    conn.execute("PRAGMA user_version = 6")
+    conn.commit(); conn.close()
+
+    setup_db.init_db()
+
+    conn = sqlite3.connect(setup_db.DB_PATH)
+    assert conn.execute("SELECT station_id, bucket, n, rain_sum FROM weather_hourly").fetchall() == [("local", 400000, 60, 1.5)]
+    pk = [r[1] for r in sorted(conn.execute("PRAGMA table_info(weather_hourly)"), key=lambda r: r[5]) if r[5]]
+    assert pk == ["station_id", "bucket"]
+    assert 'idx_station_ts' in {r[1] for r in conn.execute("PRAGMA index_list(weather_data)")}
+    conn.close()
+
+def test_agro_estimates_compacted_chill(tmp_path, monkeypatch):
+    # a v5 database with compacted history: 10-minute and daily rollups, no raw rows behind them
+    import time
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    db = str(tmp_path / "weather.db")
+    monkeypatch.setattr(setup_db, "DB_PATH", db)
+    conn = sqlite3.connect(db)
+    conn.execute('''CREATE TABLE weather_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        temp_c REAL, humidity REAL, pressure_hpa REAL, wind_speed_kph REAL,
+        rain_mm REAL, wind_dir_voltage REAL, ts INTEGER, gust_kph REAL, rain_rate_mmh REAL)''')
+    for table in ("weather_10min", "weather_daily"):
+        conn.execute(f"CREATE TABLE {table} (bucket INTEGER PRIMARY KEY, n INTEGER NOT NULL, temp_sum REAL) WITHOUT ROWID")
+    day = 20454
+    conn.executemany("INSERT INTO weather_10min VALUES (?, 10, ?)", [(day * 144, 30.0), (day * 144 + 1, -20.0), (day * 144 + 2, 100.0)])
+    conn.execute("INSERT INTO weather_daily VALUES (?, 30, 110.0)", (day,))
+    conn.execute("PRAGMA user_version = 5")
+    conn.commit(); conn.close()
+
+    setup_db.init_db()
+    monkeypatch.undo()
+    time.tzset()
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT chill_sum, frost_sum FROM weather_10min ORDER BY bucket").fetchall() == [(10, 0), (0, 10), (0, 0)]
+    assert conn.execute("SELECT station_id, chill_sum, frost_sum, chill_max FROM weather_daily").fetchall() == [("local", 10, 10, 1)]
+    assert conn.execute("SELECT COUNT(*) FROM weather_agro").fetchone()[0] == 0  # refolded on the next insert
+    conn.close()
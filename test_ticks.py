@@ -0,0 +1,23 @@
+from ticks import TickRing, peak_count, min_gap
+
+def test_ring_since_and_wrap(monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("ticks.time.monotonic", lambda: float(next(clock)))
+    ring = TickRing(8)
+    for _ in range(5): ring.tick()
+    assert ring.since(0) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    start = ring.count
+    for _ in range(10): ring.tick()
+    assert ring.count == 15
+    # only the newest 8 survive the wrap
+    assert ring.since(start) == [float(t) for t in range(7, 15)]
+
+def test_peak_count():
+    assert peak_count([], 3) == 0
+    stamps = [0.0, 1.0, 10.0, 10.5, 11.0, 12.9, 13.0, 20.0]
+    assert peak_count(stamps, 3) == 4  # 10.0 .. 12.9
+    assert peak_count(stamps, 0.6) == 2
+
+def test_min_gap():
+    assert min_gap([]) is None and min_gap([4.0]) is None
+    assert min_gap([0.0, 30.0, 42.5, 60.0]) == 12.5
@@ -0,0 +1,59 @@
+import json
+import sqlite3
+import pytest
+from writer import Writer
+
+def row(ts, rain=0.0):
+    return (ts, 20.0, 50.0, 1010.0, 3.0, rain, 1.2, 7.2, rain * 60)
+
+@pytest.fixture
+def paths(db):
+    return db, db + ".journal"
+
+def count(db):
+    conn = sqlite3.connect(db)
+    n = conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0]
+    hourly = conn.execute("SELECT COALESCE(SUM(n), 0) FROM weather_hourly").fetchone()[0]
+    conn.close()
+    return n, hourly
+
+def test_batches_and_clears_journal(paths):
+    db, journal = paths
+    w = Writer(db, journal, batch_size=3)
+    w.add(row(1000)); w.add(row(1060))
+    assert count(db) == (0, 0)
+    assert len(open(journal).readlines()) == 2
+    w.add(row(1120))
+    assert count(db) == (3, 3)
+    assert open(journal).read() == ""
+    w.close()
+
+def test_replay_after_crash(paths):
+    db, journal = paths
+    w = Writer(db, journal, batch_size=3)
+    w.add(row(1000)); w.add(row(1060)); w.add(row(1120))  # committed
+    w.journal.write(json.dumps(row(1120)) + "\n")  # as if the crash hit before the journal was cleared
+    w.add(row(1180)); w.add(row(1240, rain=0.2794))  # journaled only, then the power goes
+    w.journal.write('[1300, 20.0, 50')  # torn last line
+    w.journal.flush()
+
+    w = Writer(db, journal, batch_size=3)
+    assert w.replay() == 2
+    assert count(db) == (5, 5)
+    assert w.replay() == 0
+    w.close()
+
+def test_replay_keeps_rows_behind_a_clock_step(paths):
+    db, journal = paths
+    w = Writer(db, journal, batch_size=2)
+    w.add(row(5000)); w.add(row(5060))  # committed, then the clock is set back
+    w.add(row(4000))  # journaled only
+    w.journal.flush()
+
+    w = Writer(db, journal, batch_size=2)
+    assert w.replay() == 1
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT ts, timestamp FROM weather_data ORDER BY id").fetchall() == [
+        (5000, "1970-01-01 01:23:20"), (5060, "1970-01-01 01:24:20"), (4000, "1970-01-01 01:06:40")]
+    conn.close()
+    w.close()
@@ -0,0 +1,41 @@
+import time
+from array import array
+
+class TickRing:
+    """Preallocated ring of time.monotonic() stamps for a reed-switch counter.
+
+    tick() is the GPIO callback: one float store and one increment, no allocation and no lock.
+    `count` only ever grows, so a reader remembers the count it last saw and asks for the
+    stamps since then; the writer never waits on the reader.
+    """
+    def __init__(self, size=8192):  # power of two; 8192 covers ~130 Hz for a minute
+        self.stamps = array('d', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def tick(self):
+        self.stamps[self.count & self.mask] = time.monotonic()
+        self.count += 1
+
+    def tick_at(self, stamp):
+        # simulated and replayed sensors supply their own clock
+        self.stamps[self.count & self.mask] = stamp
+        self.count += 1
+
+    def since(self, start, end=None):
+        """Stamps of ticks start..end-1 (oldest first); ticks overwritten by wrap-around are dropped."""
+        end = self.count if end is None else end
+        start = max(start, end - self.mask - 1)
+        return [self.stamps[i & self.mask] for i in range(start, end)]
+
+def peak_count(stamps, window):
+    """Most ticks inside any `window` seconds of the sorted stamps."""
+    best, i = 0, 0
+    for j, t in enumerate(stamps):
+        while t - stamps[i] >= window: i += 1
+        best = max(best, j - i + 1)
+    return best
+
+def min_gap(stamps):
+    """Shortest spacing between consecutive sorted stamps, None with fewer than two."""
+    return min((b - a for a, b in zip(stamps, stamps[1:]) if b > a), default=None)
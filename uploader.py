@@ -0,0 +1,82 @@
+import json
+import time
+import gzip
+import sqlite3
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+import metrics
+import rollups
+from writer import COLUMNS
+
+DB_PATH = "/home/weatherstation/weather_data/weather.db"
+UPLOAD_INTERVAL = 60  # seconds between uploads once caught up
+UPLOAD_BATCH = 1440  # rows per POST, a day of readings
+BACKOFF_MAX = 900  # seconds, retry ceiling while the hub is unreachable
+TIMEOUT = 30
+
+class Uploader:
+    """Store and forward to a hub's /api/v2/ingest. The logger keeps writing this Pi's weather.db as
+    usual; that is the store, so nothing is lost while the link is down.
+
+    Rows go in id order and a batch's seq is its highest local id, so the hub's last seq is also the
+    upload cursor, and a batch resent after a lost reply is acknowledged instead of stored twice.
+    """
+    def __init__(self, hub, station, db_path=DB_PATH, token=None, batch=UPLOAD_BATCH):
+        self.url = hub.rstrip("/") + "/api/v2/ingest"
+        self.station = station
+        self.db_path = db_path
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.batch = batch
+        self.cursor = None  # hub's last seq for us, asked for before the first batch
+        self.select = f"""SELECT id, {', '.join(COLUMNS)} FROM weather_data
+                          WHERE station_id = '{rollups.LOCAL_STATION}' AND id > ? ORDER BY id LIMIT ?"""
+
+    def request(self, body=None):
+        if body is None:
+            req = urllib.request.Request(self.url + "?" + urllib.parse.urlencode({"station": self.station}), headers=self.headers)
+        else:
+            req = urllib.request.Request(self.url, body, {**self.headers, "Content-Type": "application/json",
+                                                          "Content-Encoding": "gzip"})
+        with urllib.request.urlopen(req, timeout=TIMEOUT) as resp: return json.load(resp)
+
+    def send(self, conn):
+        """Upload the next batch; returns the rows sent, 0 when caught up. Raises OSError while the hub is unreachable."""
+        if self.cursor is None: self.cursor = self.request()["seq"]
+        rows = conn.execute(self.select, (self.cursor, self.batch)).fetchall()
+        if not rows: return 0
+        batch = {"station": self.station, "seq": rows[-1][0], "rows": [r[1:] for r in rows]}
+        reply = self.request(gzip.compress(json.dumps(batch).encode()))
+        self.cursor = reply["seq"]
+        return len(rows)
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)  # its own connection, run() has its own thread
+        reg = metrics.REGISTRY
+        delay = UPLOAD_INTERVAL
+        while True:
+            try:
+                n = self.send(conn)
+                reg.counter("upload_rows_total", "Rows accepted by the hub").inc(n)
+                delay = UPLOAD_INTERVAL
+                if n == self.batch: continue  # backlog after an outage, send the next batch straight away
+            except (OSError, ValueError, KeyError) as e:  # URLError, HTTPError and timeouts are OSErrors
+                print(f"Upload to {self.url} failed: {e}")
+                reg.counter("upload_failures_total", "Uploads that failed and will be retried").inc()
+                self.cursor = None  # ask the hub where it stands before retrying
+                delay = min(delay * 2, BACKOFF_MAX)
+            time.sleep(delay)
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Forward this station's readings to a hub's /api/v2/ingest.")
+    ap.add_argument("hub", help="hub dashboard URL, e.g. http://hub.local")
+    ap.add_argument("--station", required=True, help="name this station's rows get on the hub")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--token", required=True, help="the hub's INGEST_TOKEN")
+    args = ap.parse_args()
+    print(f"Uploading {args.db} to {args.hub} as {args.station}...")
+    Uploader(args.hub, args.station, args.db, args.token).run()
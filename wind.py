@@ -0,0 +1,42 @@
+from bisect import bisect_left, bisect_right
+
+# one wind vane table for logger, app and test_hw
+# 16-point compass, index 0 = N, clockwise; the wind rose uses these sectors
+POINTS = ("N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+          "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW")
+
+# vane voltage -> compass point, calibrated on the station HAT. Only the eight main points
+# are calibrated so far; add intercardinals here once measured with test_hw.py.
+VOLT_MAP = {
+    0.4: "W", 0.9: "NW", 1.2: "N", 1.4: "SW",
+    1.8: "NE", 2.0: "S", 2.2: "SE", 2.8: "E"
+}
+TOLERANCE = 0.3  # further than this from every calibrated voltage reads as "?"
+
+# precomputed once: sorted voltages, the midpoints between them, and each one's sector
+VOLTS = sorted(VOLT_MAP)
+MIDPOINTS = [(a + b) / 2 for a, b in zip(VOLTS, VOLTS[1:])]
+SECTORS = [POINTS.index(VOLT_MAP[v]) for v in VOLTS]
+
+# wind rose speed bands, upper edges in kph (roughly Beaufort 0, 1, 2-3, 4, 5, 6, 7+)
+BAND_EDGES = (1, 6, 12, 20, 29, 39)
+BANDS = ("calm", "1-6", "6-12", "12-20", "20-29", "29-39", "39+")
+
+def nearest(volts):
+    # ties go to the lower voltage, like min() over the map did
+    return bisect_left(MIDPOINTS, volts)
+
+def direction_index(volts):
+    """Sector 0..15 for a vane voltage, None if disconnected or uncalibrated."""
+    if volts is None or volts < 0.1: return None
+    i = nearest(volts)
+    if abs(VOLTS[i] - volts) > TOLERANCE: return None
+    return SECTORS[i]
+
+def cardinal(volts):
+    if volts is None or volts < 0.1: return "--"
+    i = direction_index(volts)
+    return "?" if i is None else POINTS[i]
+
+def speed_band(kph):
+    return bisect_right(BAND_EDGES, kph or 0)
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import sqlite3
+import rollups
+import metrics
+
+COLUMNS = ("ts", "temp_c", "humidity", "pressure_hpa", "wind_speed_kph", "rain_mm", "wind_dir_voltage",
+           "gust_kph", "rain_rate_mmh")
+# timestamp is the row's own ts as UTC text, not the insert time (a batch commits minutes later)
+INSERT_Q = f"""INSERT INTO weather_data ({', '.join(COLUMNS)}, station_id, timestamp)
+               VALUES ({', '.join('?' * len(COLUMNS))}, ?, datetime(?, 'unixepoch'))"""
+# last batch sequence number accepted from each remote station, see ingest()
+SEQ_TABLE = "weather_ingest"
+
+def insert_rows(conn, rows, station=rollups.LOCAL_STATION):
+    """executemany one station's rows (tuples in COLUMNS order) and fold them into the rollups (caller commits).
+    The write lock is taken before reading MAX(id), so the id range stays this batch's own while
+    the logger and /api/v2/ingest both write."""
+    if not conn.in_transaction: conn.execute("BEGIN IMMEDIATE")
+    first = (conn.execute("SELECT MAX(id) FROM weather_data").fetchone()[0] or 0) + 1
+    conn.executemany(INSERT_Q, [(*row, station, row[0]) for row in rows])
+    rollups.update(conn, first, conn.execute("SELECT MAX(id) FROM weather_data").fetchone()[0])
+
+def create_seq_table(conn):
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {SEQ_TABLE} (station_id TEXT PRIMARY KEY, seq INTEGER NOT NULL, received INTEGER)")
+
+def last_seq(conn, station):
+    row = conn.execute(f"SELECT seq FROM {SEQ_TABLE} WHERE station_id = ?", (station,)).fetchone()
+    return row[0] if row else 0
+
+def ingest(conn, station, seq, rows):
+    """Store one uploaded batch unless its seq was already accepted; returns the rows inserted
+    (None for a resent batch). Rows and the new seq commit together, so a retry after a lost
+    reply can never insert twice."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if seq <= last_seq(conn, station):
+            conn.rollback()
+            return None
+        insert_rows(conn, [tuple(r) + (None,) * (len(COLUMNS) - len(r)) for r in rows], station)
+        conn.execute(f"""INSERT INTO {SEQ_TABLE} VALUES (?, ?, ?) ON CONFLICT(station_id)
+                         DO UPDATE SET seq = excluded.seq, received = excluded.received""", (station, seq, int(time.time())))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+class Writer:
+    """Logger write path: one persistent connection, rows journaled to disk, then inserted in batches.
+
+    Each reading is appended (and fsynced) to an append-only journal before it is buffered, so a
+    power cut loses nothing; replay() re-inserts whatever the journal holds that the db does not.
+    """
+    def __init__(self, db_path, journal_path, batch_size=5, flush_interval=300, checkpoint_interval=3600):
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent, fsync only at checkpoints
+        self.conn.execute("PRAGMA journal_size_limit=4194304")  # shrink the -wal file back after a checkpoint
+        self.buffer = []
+        self.last_flush = self.last_checkpoint = time.monotonic()
+        self.journal = open(journal_path, "a")
+
+    def add(self, row):
+        """Queue one reading (a tuple in COLUMNS order), flushing when the batch is due."""
+        self.journal.write(json.dumps(row) + "\n")
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.buffer.append(tuple(row))
+        now = time.monotonic()
+        if len(self.buffer) >= self.batch_size or now - self.last_flush >= self.flush_interval:
+            self.flush()
+        if now - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def insert(self, rows):
+        insert_rows(self.conn, rows)
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer: return
+        reg = metrics.REGISTRY
+        try:
+            with reg.timer("writer_insert_seconds", "executemany plus rollup update per batch"): self.insert(self.buffer)
+            with reg.timer("writer_commit_seconds", "Commit per batch"): self.conn.commit()
+        except Exception:
+            reg.counter("writer_flush_failures_total", "Batches that failed and stayed buffered").inc()
+            self.conn.rollback()  # rows stay buffered and journaled for the next try
+            raise
+        self.buffer = []
+        self.journal.truncate(0)
+
+    def checkpoint(self):
+        # TRUNCATE resets the -wal file; while dashboard readers hold it, fall back to PASSIVE
+        self.last_checkpoint = time.monotonic()
+        busy, _, _ = self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        if busy: self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def replay(self):
+        """Insert journaled rows left over from a crash. Returns how many were recovered."""
+        rows = []
+        with open(self.journal_path) as f:
+            for line in f:
+                try: row = tuple(json.loads(line))
+                except ValueError: continue  # torn last line from a power cut
+                rows.append(row + (None,) * (len(COLUMNS) - len(row)))  # journaled before newer columns
+        # skip only exact ts matches, rows committed before the journal was cleared (or journaled twice); after a clock
+        # step back (sync_time) real readings can be older than the newest committed one
+        if rows:
+            seen = {ts for ts, in self.conn.execute("SELECT ts FROM weather_data WHERE station_id = ? AND ts BETWEEN ? AND ?",
+                                                    (rollups.LOCAL_STATION, min(r[0] for r in rows), max(r[0] for r in rows)))}
+            rows = [r for r in rows if r[0] not in seen and not seen.add(r[0])]
+        if rows:
+            self.insert(rows)
+            self.conn.commit()
+        self.journal.truncate(0)
+        return len(rows)
+
+    def close(self):
+        self.flush()
+        self.checkpoint()
+        self.journal.close()
+        self.conn.close()